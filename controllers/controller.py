@@ -1,15 +1,72 @@
 import json
+import os
 import sys
+from dataclasses import dataclass, fields, asdict
 from pathlib import Path
-from PyQt5.QtWidgets import QApplication
+from typing import Optional, Union, TYPE_CHECKING
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, QRunnable, QThreadPool
 
-from models.image_object import ImageObject
-from models.large_image_object import LargeImageObject
-from models.scene import Scene
-from models.scene_manager import SceneManager
-from views.view import MainWindow
+# The widgets, models and views pull in OpenGL, PIL and numpy; they are imported when the Controller is built
+if TYPE_CHECKING:
+    from models.scene import Scene
+    from models.scene_manager import SceneManager
+    from views.view import MainWindow
+
+
+@dataclass
+class AppState:
+    """
+    Typed application state persisted in ~/.picpyles/appsettings.json.
+    """
+    last_opened_path: str = ""
+    # Add any additional state variables here
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AppState":
+        """
+        Create the AppState from decoded JSON, ignoring unknown keys and values of the wrong type.
+
+        Args:
+            data (dict): The decoded contents of the settings file.
+
+        Returns:
+            AppState: The application state.
+        """
+        state = cls()
+        for field in fields(cls):
+            value = data.get(field.name)
+            if isinstance(value, type(getattr(state, field.name))):
+                setattr(state, field.name, value)
+        return state
+
+
+# Settings file contents, loaded once and shared by all Controller instances
+_app_state: Optional[AppState] = None
+
+# Encoder for the settings file, created once instead of on every save
+_app_state_encoder = json.JSONEncoder()
+
+
+class ScanTask(QRunnable):
+    """
+    Runnable that loads the current folder on the global thread pool, so the window can be shown
+    while the folder is scanned and images stream into the scene.
+    """
+
+    def __init__(self, controller: "Controller"):
+        """
+        Initialize the ScanTask.
+
+        Args:
+            controller (Controller): The controller whose folder is scanned.
+        """
+        super().__init__()
+        self.controller = controller
+
+    def run(self) -> None:
+        """Scan the folder and update the scene."""
+        self.controller.scan_folder_and_update_scene()
 
-from views.utils import *
 
 class Controller:
     """
@@ -17,6 +74,10 @@ class Controller:
     and coordinates interactions between the models and views.
     """
 
+    # Fixed attribute layout; __weakref__ is required because PyQt holds weak references to bound slots
+    __slots__ = ('app', 'app_state_saved', 'assets_path', '_path', '_path_str', 'model_scene', 'model_scene_manager',
+                 'scene_manager_mutex', 'signal_connections', 'view', '__weakref__')
+
     def __init__(self, assets_path: Path, path: Path = None):
         """
         Initialize the Controller, load the application state, and set up the main components.
@@ -24,7 +85,14 @@ class Controller:
         Args:
             path (Path, optional): The path to the directory or file to load. Defaults to None.
         """
+        from PyQt5.QtWidgets import QApplication
+        from models.scene import Scene
+        from models.scene_manager import SceneManager
+        from views.view import MainWindow
+
         self.app = QApplication([])
+        self.app.aboutToQuit.connect(self.save_app_state)
+        self.app_state_saved = False
 
         self.assets_path = assets_path
 
@@ -32,69 +100,88 @@ class Controller:
         self.load_app_state()
 
         # Validate input path
-        if path and self.path:
-            self.path = self.validate_path(path)
-        else:
-            self.path = self.validate_path(self.path)
+        self.path = self.validate_path(path or getattr(self, 'path', None))
 
         # Models
-        self.model_scene = Scene()
-        self.model_scene_manager = SceneManager(self.path, self.assets_path)
+        self.model_scene: "Scene" = Scene()
+        self.model_scene_manager: "SceneManager" = SceneManager(self.path, self.assets_path)
+        self.scene_manager_mutex = QMutex()
 
         # Views
-        self.view = MainWindow(self.model_scene,self.assets_path)
+        self.view: "MainWindow" = MainWindow(self.model_scene,self.assets_path)
         self.model_scene.start_update_timer()  # Fix image load failure on first few images
         self.view.set_current_path(self.path)
 
         # Signals
-        self.reconnect_view_signals()
-        self.reconnect_msm_signals()
-
-        # Local state
-        self.running = True
-        self.clear_scene = True
+        self.signal_connections = []
+        self.reconnect_signals()
 
         self.rescan_folder_and_update_scene()
 
-    def __del__(self):
-        """Ensure the state is saved when the Controller is deleted (on application close)."""
-        self.save_app_state()
+    @property
+    def path(self) -> Path:
+        """The folder currently shown in the scene."""
+        return self._path
+
+    @path.setter
+    def path(self, value: Path) -> None:
+        """
+        Set the current folder. The path is resolved once here and its string form cached
+        for saving the app state and logging, instead of being resolved again on every use.
+
+        Args:
+            value (Path): The new folder.
+        """
+        self._path = Path(value).resolve().absolute()
+        self._path_str = str(self._path)
 
     def load_app_state(self) -> None:
         """
         Load application state from ~/.picpyles/appsettings.json if it exists.
+        The file is only read once per process; later calls reuse the parsed state.
         """
-        settings_path = Path.home() / ".picpyles/appsettings.json"
-        if settings_path.exists():
-            try:
-                with open(settings_path, 'r') as f:
-                    state = json.load(f)
-                    self.path = Path(state.get('last_opened_path')).resolve().absolute()
-                    # Load any additional state variables here
-            except Exception as e:
-                print(f"Failed to load app state: {e}")
+        global _app_state
+        if _app_state is None:
+            _app_state = AppState()
+            settings_path = Path.home() / ".picpyles/appsettings.json"
+            if settings_path.exists():
+                try:
+                    with open(settings_path, 'r') as f:
+                        _app_state = AppState.from_dict(json.load(f))
+                except Exception as e:
+                    print(f"Failed to load app state: {e}")
+
+        if _app_state.last_opened_path:
+            self.path = _app_state.last_opened_path
 
     def save_app_state(self) -> None:
         """
-        Save application state to ~/.picpyles/appsettings.json.
+        Save application state to ~/.picpyles/appsettings.json. Called once when the application quits.
+        The write is skipped if the state did not change since it was loaded or last saved.
         """
+        global _app_state
+        if self.app_state_saved:
+            return
+        self.app_state_saved = True
+
         settings_dir = Path.home() / ".picpyles"
         settings_path = settings_dir / "appsettings.json"
 
+        # Prepare the state data to save
+        state = AppState(
+            last_opened_path=self._path_str,
+        )
+        if state == _app_state:
+            return
+
         # Create the settings directory if it doesn't exist
         if not settings_dir.exists():
             settings_dir.mkdir(parents=True)
 
-        # Prepare the state data to save
-        state = {
-            "last_opened_path": str(Path(self.path).resolve().absolute()),
-            # Add any additional state variables you want to save here
-        }
-
         # Save the state as a JSON file
         try:
-            with open(settings_path, 'w') as f:
-                json.dump(state, f)
+            settings_path.write_text(_app_state_encoder.encode(asdict(state)))
+            _app_state = state
             print(f"App state saved to {settings_path}")
         except Exception as e:
             print(f"Failed to save app state: {e}")
@@ -102,31 +189,45 @@ class Controller:
     def rescan_folder_and_update_scene(self) -> None:
         """
         Rescan the current folder and update the scene with the latest objects.
+        The scan runs on the global thread pool and does not block the UI.
         """
-        self.model_scene_manager.scan_directory()
-        self.model_scene_manager.load_objects_into_scene()
-        self.model_scene.sync_objects(self.model_scene_manager.list_all_objects())
+        QThreadPool.globalInstance().start(ScanTask(self))
 
-    def reconnect_view_signals(self) -> None:
+    def scan_folder_and_update_scene(self) -> None:
         """
-        Reconnect the signals from the view to the appropriate slots in the controller.
+        Load or rescan the current folder and update the scene with the latest objects.
+        Called from the ScanTask on a worker thread. The Scene is thread-safe; it is synced
+        while holding the mutex so a concurrent load_folder() always wins.
         """
-        self.view.opengl_widget.signal_folder_selected.connect(self.load_folder)
-        self.view.opengl_widget.signal_enlarge_image.connect(self.enlarge_image)
-        self.view.opengl_widget.signal_close_image.connect(self.close_enlarge_image)
-
-    def reconnect_msm_signals(self) -> None:
+        with QMutexLocker(self.scene_manager_mutex):
+            if self.model_scene_manager.folder_loaded:
+                self.model_scene_manager.scan_directory()
+            else:
+                self.model_scene_manager.load_folder(self.model_scene_manager.path)
+            self.model_scene.sync_objects(self.model_scene_manager.list_all_objects())
+
+    def reconnect_signals(self) -> None:
         """
-        Reconnect the signals from the SceneManager to the appropriate slots in the controller.
+        Connect the signals from the view to the appropriate slots in one pass.
+        Connections made by a previous call are disconnected first, so calling this again never
+        delivers a signal to the same slot more than once.
         """
-        self.model_scene_manager.signal_add_image.connect(self.add_image_to_scene)
+        for connection in self.signal_connections:
+            QObject.disconnect(connection)
 
-    def validate_path(self, path: Path) -> Path:
+        opengl_widget = self.view.opengl_widget
+        self.signal_connections = [
+            opengl_widget.signal_folder_selected.connect(self.load_folder),
+            opengl_widget.signal_enlarge_image.connect(self.model_scene.add_object),
+            opengl_widget.signal_close_image.connect(self.model_scene.remove_object),
+        ]
+
+    def validate_path(self, path: Union[str, Path, None]) -> Path:
         """
-        Validate the provided path. If it's invalid or None, prompt the user to select a folder.
+        Validate the provided path. If it's not an existing directory or None, prompt the user to select a folder.
 
         Args:
-            path (Path): The path to validate.
+            path (Union[str, Path, None]): The path to validate.
 
         Returns:
             Path: The validated path.
@@ -134,40 +235,16 @@ class Controller:
         Raises:
             SystemExit: If no valid path is provided or selected.
         """
-        if path is None or not path.exists():
+        from views.utils import error_dialog, select_folder_dialog
+
+        path = Path(path) if path else None
+        if path is None or not os.path.isdir(path):
             path = select_folder_dialog()
             print(path)
             if path is None:
                 error_dialog("No folder was selected for viewing. Closing app.")
                 sys.exit(1)
-        return path
-
-    def add_image_to_scene(self, image_object: ImageObject) -> None:
-        """
-        Add an image object to the scene.
-
-        Args:
-            image_object: The image object to add.
-        """
-        self.model_scene.add_object(image_object)
-
-    def enlarge_image(self, large_image_object: LargeImageObject) -> None:
-        """
-        Add a large image object to the scene for enlargement.
-
-        Args:
-            large_image_object: The large image object to add.
-        """
-        self.model_scene.add_object(large_image_object)
-
-    def close_enlarge_image(self, large_image_object: LargeImageObject) -> None:
-        """
-        Remove the large image object from the scene.
-
-        Args:
-            large_image_object: The large image object to remove.
-        """
-        self.model_scene.remove_object(large_image_object)
+        return Path(path)
 
     def load_folder(self, new_folder_name: str) -> None:
         """
@@ -177,18 +254,16 @@ class Controller:
         Args:
             new_folder_name (str): The name of the new folder to load.
         """
-        self.model_scene_manager.save_state()
-        new_abs_path = (self.model_scene_manager.path / new_folder_name).resolve().absolute()
-        self.model_scene.remove_all_objects()
-        try:
-            self.path = new_abs_path
-            self.model_scene_manager = SceneManager(self.path, self.assets_path)
-        except Exception as e:
-            print(f"Loading folder {new_abs_path} failed with exception {e}")
-            self.path = self.model_scene_manager.path
-            self.model_scene_manager = SceneManager(self.path, self.assets_path)
-        self.reconnect_msm_signals()
-        self.model_scene_manager.load_objects_into_scene()
+        self.model_scene_manager.cancel_scan()
+        with QMutexLocker(self.scene_manager_mutex):
+            old_path = self.path
+            self.path = self.model_scene_manager.path / new_folder_name
+            try:
+                self.model_scene_manager.switch_path(self.path, self._path_str)
+            except Exception as e:
+                print(f"Loading folder {self._path_str} failed with exception {e}")
+                self.path = old_path
+            self.model_scene.sync_objects(self.model_scene_manager.list_all_objects())
         self.view.set_current_path(self.path)
 
     def run(self) -> None:
@@ -197,4 +272,7 @@ class Controller:
         """
         self.view.show()
         self.app.exec_()
-        self.running = False  # Stop the background thread
+        # A running scan checks the scan_cancelled event and stops early once it is set
+        self.model_scene_manager.cancel_scan()
+        QThreadPool.globalInstance().waitForDone()
+        self.model_scene_manager.shutdown_executors()
@@ -1,5 +1,12 @@
 import argparse
+import multiprocessing
+import os
 from pathlib import Path
+
+import OpenGL
+# PyOpenGL calls glGetError after every GL call unless this is disabled before OpenGL.GL is first imported
+OpenGL.ERROR_CHECKING = os.environ.get("PICPYLES_GL_DEBUG") == "1"
+
 from controllers.controller import Controller
 from pathlib import Path
 import sys
@@ -45,4 +52,6 @@ def main() -> None:
     controller.run()
 
 if __name__ == "__main__":
+    # Thumbnails are created in worker processes, which must not start the app in a frozen executable
+    multiprocessing.freeze_support()
     main()
@@ -4,29 +4,49 @@ from typing import List, Tuple
 from models.scene_object import SceneObject
 import pyqtree
 
+# Images are wider than tall, so horizontal distances are shrunk to favour walking along rows
+TSP_AXIS_SCALE = np.array((2.5, 1.0, 1.0))
+
 
 def calculate_total_distance(order, points):
-    return sum(np.linalg.norm(points[order[i]] - points[order[i - 1]]) for i in range(len(order)))
+    """
+    Calculate the length of the closed tour through the points in the given order.
 
+    Args:
+        order (list): The order of the points.
+        points (np.ndarray): An array of shape (n, 3) with the points.
 
-def find_outlier_edges(points: np.ndarray, order: list) -> list:
+    Returns:
+        float: The total length of the tour, including the edge from the last back to the first point.
+    """
+    order = np.asarray(order)
+    diffs = points[order] - points[np.roll(order, 1)]
+    return float(np.sqrt(np.einsum('ij,ij->i', diffs, diffs)).sum())
+
+
+def find_outlier_edges(points: np.ndarray, order: list, distance_matrix: np.ndarray = None) -> list:
     """
     Identify the outlier edges in the current TSP order based on the given threshold.
 
     Args:
         points (np.ndarray): An array of shape (n, 3) representing the points in 3D space.
         order (list): The current order of points in the TSP solution.
-        threshold (float): The distance threshold to consider an edge as an outlier.
+        distance_matrix (np.ndarray, optional): The (n, n) pairwise distances of the points.
+            If given, the edge lengths are looked up instead of computed.
 
     Returns:
         list: A list of tuples representing the indices of outlier edges.
     """
-    # Calculate the differences between consecutive points in the order
-    ordered_points = points[order]
-    diffs = np.diff(ordered_points, axis=0)
+    if distance_matrix is not None:
+        order = np.asarray(order)
+        distances = distance_matrix[order[:-1], order[1:]]
+    else:
+        # Calculate the differences between consecutive points in the order
+        ordered_points = points[order]
+        diffs = np.diff(ordered_points, axis=0)
 
-    # Calculate the Euclidean distance for each edge
-    distances = np.linalg.norm(diffs, axis=1)
+        # Calculate the Euclidean distance for each edge
+        distances = np.linalg.norm(diffs, axis=1)
 
     # Find the indices where the distance exceeds the threshold
     thresh = np.percentile(distances,0.5) * 2
@@ -38,36 +58,78 @@ def find_outlier_edges(points: np.ndarray, order: list) -> list:
     return outliers
 
 
-def two_opt(points, order):
-    improved = True
-    best_order = order
-    best_distance = calculate_total_distance(best_order, points)
+def two_opt(points: np.ndarray, order: List[int], distance_matrix: np.ndarray = None) -> List[int]:
+    """
+    Improve a TSP order with 2-opt moves. Reversing order[i:j] only replaces the edges
+    (i-1, i) and (j-1, j), so each move is scored by that change in length, looked up in the
+    distance matrix for all j at once, instead of recomputing the total distance of a new order.
 
-    # Identify outlier edges
-    outliers = find_outlier_edges(points, best_order)
+    Args:
+        points (np.ndarray): An array of shape (n, 3) representing the points in 3D space.
+        order (List[int]): The initial order of points.
+        distance_matrix (np.ndarray, optional): The (n, n) pairwise distances of the points.
+            Computed from the points if not given.
+
+    Returns:
+        List[int]: The improved order of points.
+    """
+    if distance_matrix is None:
+        distance_matrix = create_distance_matrix(points)
+    best_order = np.array(order, dtype=np.intp)
+    n = len(best_order)
 
+    # Identify outlier edges and mark both of their ends
+    outliers = find_outlier_edges(points, best_order, distance_matrix)
+    is_outlier = np.zeros(n, dtype=bool)
+    is_outlier[np.array(outliers, dtype=np.intp).ravel()] = True
+
+    improved = True
     iters = 0
-    while improved and iters<32:
+    while improved and iters < 32:
         improved = False
-        for i in range(1, len(order) - 1):
-            if any(i in outlier for outlier in outliers):
+        for i in range(1, n - 2):
+            if is_outlier[i]:
                 continue  # Skip outlier edges initially
 
-            for j in range(i + 1, len(order)):
-                if j - i == 1:
-                    continue  # adjacent edges, no swap needed
-                new_order = best_order[:i] + best_order[i:j][::-1] + best_order[j:]
-                new_distance = calculate_total_distance(new_order, points)
-                if new_distance < best_distance:
-                    best_order = new_order
-                    best_distance = new_distance
-                    improved = True
-        iters +=1
+            # adjacent edges (j == i + 1) need no swap
+            a, b = best_order[i - 1], best_order[i]
+            c, d = best_order[i + 1:n - 1], best_order[i + 2:]
+            delta = (distance_matrix[a, c] + distance_matrix[b, d]
+                     - distance_matrix[a, b] - distance_matrix[c, d])
+            k = np.argmin(delta)
+            if delta[k] < -1e-12:
+                j = i + 2 + k
+                best_order[i:j] = best_order[i:j][::-1].copy()
+                improved = True
+        iters += 1
 
         # Reintroduce outlier edges
-        outliers = []  # Now allow all edges to be considered
+        is_outlier[:] = False  # Now allow all edges to be considered
+
+    return best_order.tolist()
+
 
-    return best_order
+def create_distance_matrix(positions: np.ndarray) -> np.ndarray:
+    """
+    Creates a distance matrix for the given positions.
+    Uses |a-b|^2 = |a|^2 + |b|^2 - 2a.b, so only (n, n) arrays are allocated
+    instead of the (n, n, d) array of all pairwise differences.
+
+    Args:
+        positions (np.ndarray): An array of shape (n, 2) containing the positions.
+
+    Returns:
+        np.ndarray: An array of shape (n, n) containing the pairwise distances.
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.float64)
+    squared_norms = np.einsum('ij,ij->i', positions, positions)
+    distances = positions @ positions.T
+    distances *= -2.0
+    distances += squared_norms[:, None]
+    distances += squared_norms[None, :]
+    np.maximum(distances, 0.0, out=distances)  # rounding can leave tiny negatives
+    np.fill_diagonal(distances, 0.0)
+    return np.sqrt(distances, out=distances)
 
 
 def build_quadtree(points: np.ndarray, boundary: Tuple[float, float, float, float]) -> pyqtree.Index:
@@ -88,47 +150,53 @@ def build_quadtree(points: np.ndarray, boundary: Tuple[float, float, float, floa
     return qt
 
 
-def tsp_nearest_neighbor(points: np.ndarray, quadtree: pyqtree.Index) -> List[int]:
+def tsp_nearest_neighbor(points: np.ndarray, quadtree: pyqtree.Index, search_radius: float = 2.0) -> List[int]:
     """
     Solve the TSP problem using a nearest neighbor heuristic with a quadtree.
 
+    Visited points are removed from the quadtree, so a query only returns unvisited candidates.
+    The search box around the current point starts at search_radius and doubles until it contains
+    a candidate; if the nearest candidate is farther away than the box half-width, the box is grown
+    to that distance once more, since a closer point may lie just outside the box.
+
     Args:
         points (np.ndarray): An array of shape (n, 3) representing the points in 3D space.
-        quadtree (pyqtree.Index): A quadtree containing the points.
+        quadtree (pyqtree.Index): A quadtree containing the points. Points are removed from it.
+        search_radius (float): Half-width of the initial search box. Defaults to 2.0.
 
     Returns:
         List[int]: The order of points for the TSP solution.
     """
     num_points = len(points)
-    unvisited = set(range(num_points))
 
     top_left = np.array((np.min(points[:,0]),np.max(points[:,1]),np.min(points[:,2])))
     distances = np.linalg.norm(points - top_left,axis=1)
 
-    current = np.argmin(distances)
+    current = int(np.argmin(distances))
     order = [current]
-    unvisited.remove(current)
-
-    while unvisited:
-        # Define a slightly larger bounding box to find close neighbors
-        bbox = (points[current][0] - 2, points[current][1] - 2,
-                points[current][0] + 2, points[current][1] + 2)
-
-        # Find all neighbors within this bounding box
-        neighbors = quadtree.intersect(bbox)
-
-        # Filter out already visited points
-        neighbors = [idx for idx in neighbors if idx in unvisited]
-
-        if not neighbors:
-            # If no neighbors are found in the small box, expand the search area
-            neighbors = list(unvisited)
-
-        # Find the nearest unvisited neighbor
-        nearest_point = min(neighbors, key=lambda idx: np.linalg.norm(points[current] - points[idx]))
-        current = nearest_point
+    quadtree.remove(current, (points[current][0], points[current][1], points[current][0], points[current][1]))
+
+    for _ in range(num_points - 1):
+        x, y = points[current][:2]
+        radius = search_radius
+        while True:
+            neighbors = quadtree.intersect((x - radius, y - radius, x + radius, y + radius))
+            if not neighbors:
+                # If no neighbors are found in the box, expand the search area
+                radius *= 2.0
+                continue
+
+            # Find the nearest unvisited neighbor
+            neighbors = np.fromiter(neighbors, dtype=np.intp, count=len(neighbors))
+            distances = np.linalg.norm(points[neighbors] - points[current], axis=1)
+            k = np.argmin(distances)
+            if distances[k] <= radius:
+                break
+            radius = distances[k]
+
+        current = int(neighbors[k])
         order.append(current)
-        unvisited.remove(current)
+        quadtree.remove(current, (points[current][0], points[current][1], points[current][0], points[current][1]))
 
     return order
 
@@ -145,9 +213,14 @@ class ConnectorLine(SceneObject):
         """
         super().__init__(position=(0.0, 0.0, 0.0), size=(0.0, 0.0, 0.0), color=color)
         self.has_thumbnail = True # Hack to ignore the thumbnail check
-        self.positions = positions.copy()
+        self.positions = positions  # not copied; callers pass a freshly built array
+        self.scaled_positions = np.divide(self.positions, TSP_AXIS_SCALE)
         self.order = self.solve_tsp()
+        self.max_order_index = max(self.order)
+        self.order_valid = True  # every index in the order refers to a current position
         self.visible = True  # By default, the connector line is visible
+        self.vbo = None  # Vertex buffer of the line strip, created on first render when a GL context is current
+        self.vbo_dirty = True  # The vertex buffer must be refilled before the next draw
 
     def get_order_index(self, position: np.ndarray):
         try:
@@ -178,21 +251,50 @@ class ConnectorLine(SceneObject):
         self.visible = False
 
     def update_positions(self, positions):
-        self.positions = positions.copy()
+        """
+        Update the positions of the connected objects. This runs on every frame, so nothing is done
+        if the positions did not change, and the scaled positions array is reused where possible.
+
+        Args:
+            positions (np.ndarray): An array of shape (n, 3) with the positions of the objects.
+        """
+        if np.array_equal(positions, self.positions):
+            return
+        if self.scaled_positions.shape != positions.shape:
+            self.scaled_positions = np.empty(positions.shape)
+        np.divide(positions, TSP_AXIS_SCALE, out=self.scaled_positions)
+        self.positions = positions
+        self.order_valid = self.max_order_index < len(self.positions)
+        self.vbo_dirty = True
+
+    def upload_vertices(self) -> None:
+        """Fill the vertex buffer with the positions in TSP order, slightly above the images."""
+        vertices = (self.positions[self.order] + np.array((0.0, 0.0, 0.01))).astype(np.float32)
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.vbo_dirty = False
 
     def render_object(self) -> None:
         """Render the connector line if it's visible."""
-        if not self.visible or np.max(self.order) > len(self.positions):
+        if not self.visible or not self.order_valid:
             return
 
+        if self.vbo_dirty:
+            self.upload_vertices()
+
         glColor3f(*self.color)  # Use the color specified in the initialization
         glLineWidth(2.0)  # Set the line width
 
-        glBegin(GL_LINE_STRIP)
-        for index in self.order:
-            x, y, z = self.positions[index]
-            glVertex3f(x, y, z+0.01)
-        glEnd()
+        # Draw the whole line strip with a single call from the vertex buffer
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glDrawArrays(GL_LINE_STRIP, 0, len(self.order))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_VERTEX_ARRAY)
 
     def create_distance_matrix(self, positions: np.ndarray) -> np.ndarray:
         """
@@ -204,8 +306,7 @@ class ConnectorLine(SceneObject):
         Returns:
             np.ndarray: An array of shape (n, n) containing the pairwise distances.
         """
-        distances = np.linalg.norm(positions[:, None] - positions, axis=-1)
-        return distances
+        return create_distance_matrix(positions)
 
     def solve_tsp(self) -> List[int]:
         """
@@ -214,14 +315,14 @@ class ConnectorLine(SceneObject):
         Returns:
             List[int]: A list of indices representing the order of objects.
         """
-        # distance_matrix = self.create_distance_matrix(self.positions/np.array((2.5,1.0,1.0)))
+        # distance_matrix = self.create_distance_matrix(self.scaled_positions)
         #
         # # Solve the TSP using the greedy algorithm
         # order = solve_tsp(distance_matrix)
-        points = self.positions/np.array((2.5,1.0,1.0))
+        points = self.scaled_positions
         boundary = np.concatenate((np.min(points[:,:2],axis=0),np.max(points[:,:2],axis=0)))
         quadtree = build_quadtree(points, boundary)
         order = tsp_nearest_neighbor(points, quadtree)
-        # order = two_opt(points, order)
+        # order = two_opt(points, order, self.create_distance_matrix(points))
 
         return order
@@ -1,25 +1,134 @@
 import concurrent.futures
+import ctypes
+import heapq
+import itertools
+import multiprocessing
+import os
 import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, Callable
 
 import numpy as np
 from OpenGL.GL import *
-from PIL import Image
 
 from models.scene_object import SceneObject
+from models.thumbnails import decode_texture_data, prepare_thumbnail
 from models.types import *
 
+
+class TextureCache:
+    """
+    Process-wide cache of uploaded textures, keyed by the path of the decoded image, so all objects showing
+    the same image, like the folder icons, share one texture. Textures are reference counted and deleted
+    once the last object releases them.
+    """
+
+    lock = threading.Lock()
+    textures: Dict[str, List[int]] = {}  # key -> [texture_id, width, height, refcount]
+    released_texture_ids: List[int] = []  # deleted on the GL thread by delete_released_textures()
+
+    @classmethod
+    def contains(cls, key: str) -> bool:
+        """
+        Check whether a texture is cached.
+
+        Args:
+            key (str): The path of the decoded image.
+
+        Returns:
+            bool: True if the texture is cached.
+        """
+        with cls.lock:
+            return key in cls.textures
+
+    @classmethod
+    def get_or_load(cls, key: str, load: Callable[[], Tuple[int, int, int]]) -> Tuple[int, int, int]:
+        """
+        Take a reference to a cached texture, uploading it first if it is not cached. Must be called
+        on the GL thread.
+
+        Args:
+            key (str): The path of the decoded image.
+            load (Callable[[], Tuple[int, int, int]]): Uploads the texture and returns its ID, width and height.
+
+        Returns:
+            Tuple[int, int, int]: The texture ID, width and height.
+        """
+        with cls.lock:
+            entry = cls.textures.get(key)
+            if entry is not None:
+                entry[3] += 1
+                return entry[0], entry[1], entry[2]
+        texture_id, width, height = load()
+        with cls.lock:
+            cls.textures[key] = [texture_id, width, height, 1]
+        return texture_id, width, height
+
+    @classmethod
+    def release(cls, key: str) -> None:
+        """
+        Drop a reference to a cached texture. May be called from any thread; the texture is deleted
+        by the next delete_released_textures() call once it is no longer referenced.
+
+        Args:
+            key (str): The path of the decoded image.
+        """
+        with cls.lock:
+            entry = cls.textures.get(key)
+            if entry is None:
+                return
+            entry[3] -= 1
+            if entry[3] <= 0:
+                del cls.textures[key]
+                cls.released_texture_ids.append(entry[0])
+
+    @classmethod
+    def delete_released_textures(cls) -> None:
+        """Delete the textures that are no longer referenced. Must be called on the GL thread."""
+        with cls.lock:
+            texture_ids, cls.released_texture_ids = cls.released_texture_ids, []
+        if texture_ids:
+            glDeleteTextures(texture_ids)
+
+
 class ImageObject(SceneObject):
     """
     Represents an image object in the scene. It can load textures, create thumbnails, and render itself.
     """
 
-    # Initialize the thread pool for concurrent thumbnail creation
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    # Initialize the process pool for thumbnail creation and image decoding. Pillow holds the GIL for much of
+    # this work, so threads would not use more than one core. Workers are spawned, as forking a process
+    # running Qt and OpenGL threads is not safe.
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                                      mp_context=multiprocessing.get_context("spawn"))
+    # Thumbnails being prepared, by texture key, so objects showing the same image share one job
+    pending_thumbnails: Dict[str, concurrent.futures.Future] = {}
+    pending_thumbnails_lock = threading.Lock()
+    # Jobs not yet submitted to the executor: a heap of (priority, sequence, key) entries, lower priorities first,
+    # and the current [priority, prepare_thumbnail() arguments] of each queued key
+    thumbnail_queue: List[Tuple[int, int, str]] = []
+    queued_thumbnails: Dict[str, List[Any]] = {}
+    thumbnail_sequence = itertools.count()
+    thumbnails_in_flight = 0
+    max_thumbnails_in_flight = 2 * (os.cpu_count() or 1)
+    thumbnail_priority = 1  # visible objects are moved to priority 0
+    max_texture_size = 4096  # larger images are downscaled before upload
+    upload_pbo: Optional[int] = None  # Pixel buffer that texture uploads are staged in, shared by all images
+
+    # Two triangles of unit width and height, centered at the origin, as x, y, z, u, v vertices.
+    # Textures hold the image rows top to bottom, so v runs downwards instead of flipping the pixels.
+    UNIT_QUAD = np.array([
+        (-0.5, -0.5, 0.0, 0.0, 1.0),  # bottom left
+        (0.5, -0.5, 0.0, 1.0, 1.0),  # bottom right
+        (0.5, 0.5, 0.0, 1.0, 0.0),  # top right
+        (0.5, 0.5, 0.0, 1.0, 0.0),  # top right
+        (-0.5, 0.5, 0.0, 0.0, 0.0),  # top left
+        (-0.5, -0.5, 0.0, 0.0, 1.0),  # bottom left
+    ], dtype=np.float32)
 
     def __init__(self, image_path: str, position: Vec3, size: Vec3, name: Optional[str] = None,
-                 parent_dir: Optional[str] = None, object_type: str = "image", use_thumbnail: bool = True):
+                 parent_dir: Optional[str] = None, object_type: str = "image", use_thumbnail: bool = True,
+                 mtime: Optional[float] = None):
         """
         Initialize the ImageObject with its image path, position, size, and other properties.
 
@@ -31,18 +140,140 @@ class ImageObject(SceneObject):
             parent_dir (Optional[str]): Directory containing the image. Defaults to None.
             object_type (str): Type of the object, either "image" or "folder". Defaults to "image".
             use_thumbnail (bool): Whether to use a thumbnail for rendering. Defaults to True.
+            mtime (Optional[float]): Modification time of the image file as reported by the directory scan.
+                Defaults to None.
         """
         self.use_thumbnail = use_thumbnail
+        self.mtime = mtime
         self.image_path = Path(parent_dir) / image_path if parent_dir else Path(image_path)
         self.object_type = object_type
         name = name or self.image_path.name
         super().__init__(position, size, text=name)
 
         self.texture_id: Optional[int] = None
+        self.texture_data: Optional[Tuple[List[bytes], int, int]] = None  # Decoded RGB mipmaps, width and height
         self.has_thumbnail: Optional[bool] = False
 
-        self.lock = threading.Lock()
-        self.executor.submit(self.update_thumbnail)
+        self.thumbnail_folder = self.image_path.absolute().parent / ".ppyles" / "thumbnails"
+        self.thumbnail_path = self.thumbnail_folder / self.image_path.name
+        self.texture_key = str(self.thumbnail_path if self.use_thumbnail else self.image_path)
+
+        self.thumbnail_future = self.submit_thumbnail()
+        self.thumbnail_future.add_done_callback(self.on_thumbnail_ready)
+
+    def submit_thumbnail(self) -> concurrent.futures.Future:
+        """
+        Queue the preparation of the thumbnail and texture. If the same image is already being prepared
+        for another object, like the shared folder icon, its job is reused instead.
+
+        Returns:
+            concurrent.futures.Future: Completed with the result of prepare_thumbnail().
+        """
+        key = self.texture_key
+        with self.pending_thumbnails_lock:
+            future = self.pending_thumbnails.get(key)
+            if future is not None:
+                return future
+            # Textures that are already uploaded for another object need not be decoded again
+            texture_path = None if TextureCache.contains(key) else Path(key)
+            future = concurrent.futures.Future()
+            self.pending_thumbnails[key] = future
+            self.queued_thumbnails[key] = [
+                self.thumbnail_priority, (self.image_path, self.thumbnail_path, texture_path, self.max_texture_size)]
+            heapq.heappush(self.thumbnail_queue, (self.thumbnail_priority, next(self.thumbnail_sequence), key))
+
+        # Added outside the lock, as the callback runs right away if the job already finished
+        future.add_done_callback(lambda _: self.forget_pending_thumbnail(key))
+        self.dispatch_thumbnails()
+        return future
+
+    @classmethod
+    def dispatch_thumbnails(cls) -> None:
+        """
+        Submit queued thumbnail jobs to the executor, most urgent first, until max_thumbnails_in_flight
+        jobs are running. Keeping the executor's own queue short lets later priorities still take effect.
+        """
+        jobs = []
+        with cls.pending_thumbnails_lock:
+            while ImageObject.thumbnails_in_flight < cls.max_thumbnails_in_flight and cls.thumbnail_queue:
+                priority, _, key = heapq.heappop(cls.thumbnail_queue)
+                queued = cls.queued_thumbnails.get(key)
+                if queued is None or queued[0] != priority:
+                    continue  # already submitted, or superseded by an entry of higher priority
+                del cls.queued_thumbnails[key]
+                # Counted on ImageObject: through a subclass, cls.thumbnails_in_flight += 1 would give the
+                # subclass a separate counter
+                ImageObject.thumbnails_in_flight += 1
+                jobs.append((cls.pending_thumbnails[key], queued[1]))
+
+        for future, args in jobs:
+            try:
+                job = cls.executor.submit(prepare_thumbnail, *args)
+            except RuntimeError:
+                # The executor was shut down
+                with cls.pending_thumbnails_lock:
+                    ImageObject.thumbnails_in_flight -= 1
+                future.cancel()
+                continue
+            job.add_done_callback(lambda job, future=future: cls.on_thumbnail_job_done(future, job))
+
+    @classmethod
+    def on_thumbnail_job_done(cls, future: concurrent.futures.Future, job: concurrent.futures.Future) -> None:
+        """
+        Pass the outcome of a finished executor job on to the future handed out by submit_thumbnail()
+        and submit the next queued job.
+
+        Args:
+            future (concurrent.futures.Future): The future handed out by submit_thumbnail().
+            job (concurrent.futures.Future): The finished executor job.
+        """
+        with cls.pending_thumbnails_lock:
+            ImageObject.thumbnails_in_flight -= 1
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            future.set_result(job.result())
+        cls.dispatch_thumbnails()
+
+    @classmethod
+    def prioritize_thumbnails(cls, objects: List["ImageObject"]) -> None:
+        """
+        Move the queued thumbnail jobs of the given objects, e.g. the ones on screen, to the front of the queue.
+
+        Args:
+            objects (List[ImageObject]): The objects whose thumbnails are needed first.
+        """
+        with cls.pending_thumbnails_lock:
+            for obj in objects:
+                queued = cls.queued_thumbnails.get(obj.texture_key)
+                if queued is not None and queued[0] > 0:
+                    queued[0] = 0
+                    heapq.heappush(cls.thumbnail_queue, (0, next(cls.thumbnail_sequence), obj.texture_key))
+
+    @classmethod
+    def shutdown_executor(cls) -> None:
+        """Drop the queued thumbnail jobs and shut down the executor without waiting for running jobs."""
+        with cls.pending_thumbnails_lock:
+            queued_keys = list(cls.queued_thumbnails)
+            cls.queued_thumbnails.clear()
+            cls.thumbnail_queue.clear()
+            futures = [cls.pending_thumbnails[key] for key in queued_keys]
+        for future in futures:
+            future.cancel()
+        cls.executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def forget_pending_thumbnail(cls, key: str) -> None:
+        """
+        Remove a finished job from the pending thumbnails.
+
+        Args:
+            key (str): The texture key of the job.
+        """
+        with cls.pending_thumbnails_lock:
+            cls.pending_thumbnails.pop(key, None)
 
     def move_to(self, position: Vec3) -> None:
         """
@@ -53,34 +284,32 @@ class ImageObject(SceneObject):
         """
         if isinstance(position, np.ndarray) and len(position) == 3:
             self.position = position
+            self.vertices = self.create_vertices()
+            self.mark_moved()
 
-    def update_thumbnail(self) -> None:
+    def on_thumbnail_ready(self, future: concurrent.futures.Future) -> None:
         """
-        Create or update the thumbnail for the image.
-        """
-        with self.lock:
-            img_path = Path(self.image_path)
-            self.thumbnail_folder = img_path.absolute().parent / ".ppyles" / "thumbnails"
-            self.thumbnail_path = self.thumbnail_folder / img_path.name
-            if not self.thumbnail_folder.exists():
-                self.thumbnail_folder.mkdir(parents=True)
-            if not self.thumbnail_path.exists():
-                self.create_thumbnail()
-            self.has_thumbnail = True
+        Take over the texture data decoded by the worker process once the thumbnail is ready.
 
-    def create_thumbnail(self) -> None:
+        Args:
+            future (concurrent.futures.Future): The future of prepare_thumbnail().
         """
-        Create a thumbnail for the image and save it to the .ppyles folder.
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Failed to create thumbnail: {future.exception()}")
+            return
+        self.texture_data = future.result()
+        self.has_thumbnail = True
+
+    def decode_texture_data(self) -> Tuple[List[bytes], int, int]:
         """
-        img_path = Path(self.image_path)
-        if not img_path.exists():
-            raise FileNotFoundError(f"Image file {self.image_path} not found.")
+        Decode the image or its thumbnail into RGB mipmaps, see decode_texture_data().
 
-        with Image.open(self.image_path) as img:
-            img = img.convert("RGB")
-            img.thumbnail((512, 512))
-            img.save(self.thumbnail_path, "JPEG")
-            print(f"Thumbnail saved to {self.thumbnail_path}")
+        Returns:
+            Tuple[List[bytes], int, int]: The pixel data of each mipmap level, width and height of the texture.
+        """
+        return decode_texture_data(Path(self.texture_key), self.max_texture_size)
 
     def to_dict(self, preserve_image_path: bool = False) -> Dict[str, Any]:
         """
@@ -111,7 +340,8 @@ class ImageObject(SceneObject):
 
     def load_texture(self) -> Optional[int]:
         """
-        Load the texture from the image or its thumbnail.
+        Load the texture from the image or its thumbnail. Objects showing the same image share
+        the texture through the TextureCache.
 
         Returns:
             Optional[int]: The texture ID if successful, otherwise None.
@@ -123,30 +353,15 @@ class ImageObject(SceneObject):
             return self.texture_id
 
         try:
-            image = Image.open(self.thumbnail_path if self.use_thumbnail else self.image_path)
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            img_data = image.convert("RGBA").tobytes()
-            width, height = image.size
+            texture_id, width, height = TextureCache.get_or_load(self.texture_key, self.upload_texture)
+            # The pixel data is only needed for the first upload of the texture
+            self.texture_data = None
             sx, sy = self.size
             scale_factor = min(sx, sy) / min(width, height)
 
             self.size = np.array([width * scale_factor, height * scale_factor])
             self.vertices = self.create_vertices()
-
-            texture_id = glGenTextures(1)
-            if texture_id == 0:
-                raise ValueError("Failed to generate texture")
-
-            glBindTexture(GL_TEXTURE_2D, texture_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-            glGenerateMipmap(GL_TEXTURE_2D)
-
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-
-            glBindTexture(GL_TEXTURE_2D, 0)
+            self.mark_moved()
 
             self.texture_id = texture_id
             return texture_id
@@ -154,63 +369,89 @@ class ImageObject(SceneObject):
             print(f"Failed to load texture: {e}")
             return None
 
-    def create_vertices(self) -> List[VertexWithTexCoord]:
+    def upload_texture(self) -> Tuple[int, int, int]:
         """
-        Create the vertices for the image object based on its position and size.
-
-        Each vertex is paired with texture coordinates, which are used for mapping textures onto the object.
+        Upload the decoded image into a new texture.
 
         Returns:
-            List[VertexWithTexCoord]: A list of tuples, where each tuple contains a vertex (as a numpy array) and
-            its corresponding texture coordinates (as a tuple of two floats).
-        """
-        half_size = self.size / 2.0
-        bottom_left = self.position + np.array([-half_size[0], -half_size[1], 0.0])
-        bottom_right = self.position + np.array([half_size[0], -half_size[1], 0.0])
-        top_left = self.position + np.array([-half_size[0], half_size[1], 0.0])
-        top_right = self.position + np.array([half_size[0], half_size[1], 0.0])
-
-        vertices = [
-            (bottom_left, (0.0, 0.0)),
-            (bottom_right, (1.0, 0.0)),
-            (top_right, (1.0, 1.0)),
-            (top_right, (1.0, 1.0)),
-            (top_left, (0.0, 1.0)),
-            (bottom_left, (0.0, 0.0)),
-        ]
-        return vertices
+            Tuple[int, int, int]: The texture ID, width and height.
 
-    def render_object(self) -> None:
-        """
-        Render the image object using OpenGL.
+        Raises:
+            ValueError: If the texture could not be generated.
         """
-        if not self.has_thumbnail:
-            return
+        # Normally decoded by the thumbnail worker
+        texture_data = self.texture_data if self.texture_data is not None else self.decode_texture_data()
+        levels, width, height = texture_data
+
+        texture_id = glGenTextures(1)
+        if texture_id == 0:
+            raise ValueError("Failed to generate texture")
+
+        # Stage all levels in the pixel buffer, so the driver copies them into the texture asynchronously
+        # instead of stalling until glTexImage2D has read the client memory. Respecifying the buffer storage
+        # orphans the previous upload's storage, so it is never waited for.
+        if ImageObject.upload_pbo is None:
+            ImageObject.upload_pbo = glGenBuffers(1)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, ImageObject.upload_pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, sum(len(level_data) for level_data in levels), None, GL_STREAM_DRAW)
+        offset = 0
+        for level_data in levels:
+            glBufferSubData(GL_PIXEL_UNPACK_BUFFER, offset, len(level_data), level_data)
+            offset += len(level_data)
+
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)  # RGB rows are not padded to 4 bytes
+        # Immutable storage for all levels is allocated once, so the driver need not check the mipmap chain
+        # for completeness on every level upload; without GL 4.2 each level is specified on its own
+        use_storage = bool(glTexStorage2D)
+        if use_storage:
+            glTexStorage2D(GL_TEXTURE_2D, len(levels), GL_RGB8, width, height)
+        offset = 0
+        for level, level_data in enumerate(levels):
+            level_width, level_height = max(1, width >> level), max(1, height >> level)
+            if use_storage:
+                glTexSubImage2D(GL_TEXTURE_2D, level, 0, 0, level_width, level_height,
+                                GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(offset))
+            else:
+                glTexImage2D(GL_TEXTURE_2D, level, GL_RGB8, level_width, level_height, 0,
+                             GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(offset))
+            offset += len(level_data)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+
+        # Quads only map texture coordinates in [0, 1]; clamping keeps the opposite edge from bleeding in
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        if self.texture_id is None:
-            self.load_texture()
-
-        if self.texture_id == 0:
-            print("No valid texture to render.")
-            return
-
-        glEnable(GL_TEXTURE_2D)
-        glBindTexture(GL_TEXTURE_2D, self.texture_id)
-
-        glColor3f(1.0, 1.0, 1.0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        return texture_id, width, height
 
-        glBegin(GL_TRIANGLES)
-        for vertex, tex_coord in self.vertices:
-            glTexCoord2f(*tex_coord)
-            glVertex3f(*vertex)
-        glEnd()
+    def release_texture(self) -> None:
+        """
+        Release the texture of an object that is dropped for good. The object is not drawn anymore;
+        the texture is deleted once no other object uses it. Its own buffers and text texture are deleted as well.
+        """
+        self.has_thumbnail = False
+        if self.texture_id is not None:
+            self.texture_id = None
+            TextureCache.release(self.texture_key)
+        self.texture_data = None
+        self.release_gl_objects()
 
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glDisable(GL_TEXTURE_2D)
+    def create_vertices(self) -> np.ndarray:
+        """
+        Create the vertices for the image object based on its position and size.
 
-        if self.selected:
-            self.render_bounding_box()
+        Each vertex is interleaved with its texture coordinates, which are used for mapping textures onto
+        the object, so the array can be uploaded to a vertex buffer as is.
 
-        error = glGetError()
-        if error != GL_NO_ERROR:
-            print(f"OpenGL Error: {error}")
+        Returns:
+            np.ndarray: A float32 array of shape (6, 5) with the x, y, z, u, v values of the two triangles.
+        """
+        vertices = self.UNIT_QUAD.copy()
+        vertices[:, :2] *= self.size[:2]
+        vertices[:, :3] += self.position[:3]
+        return vertices
@@ -1,5 +1,3 @@
-from pathlib import Path
-
 from models.image_object import ImageObject
 from models.types import *
 
@@ -9,6 +7,13 @@ class LargeImageObject(ImageObject):
     Represents a larger version of an ImageObject, typically used for detailed viewing.
     """
 
+    thumbnail_priority = 0  # opened by the user, so decoded before any queued thumbnails
+
+    # Enlarged size, maintaining the aspect ratio, and a position slightly above the original plane.
+    # SceneObject copies both, so the constants are never modified.
+    LARGE_SIZE = np.array((10.0, 10.0 * 9.0 / 16.0))
+    LARGE_POSITION = np.array((0.0, 0.0, 0.1))
+
     def __init__(self, image_object: ImageObject) -> None:
         """
         Initialize a LargeImageObject based on an existing ImageObject.
@@ -16,16 +21,13 @@ class LargeImageObject(ImageObject):
         Args:
             image_object (ImageObject): The ImageObject instance to be enlarged.
         """
-        size: Vec3 = (10.0, 10.0 * 9.0 / 16.0)  # Enlarged size, maintaining the aspect ratio.
-        position: Vec3 = np.array([0.0, 0.0, 0.1])  # Position slightly above the original plane.
-        parent_dir: Path = Path(image_object.image_path).parent
-
         super().__init__(
             image_path=image_object.image_path,
-            position=position,
-            size=size,
+            position=self.LARGE_POSITION,
+            size=self.LARGE_SIZE,
             name=image_object.text,
-            parent_dir=parent_dir,
+            parent_dir=image_object.image_path.parent,
             object_type=image_object.object_type,
-            use_thumbnail=False  # Don't use a thumbnail for the large image.
+            use_thumbnail=False,  # Don't use a thumbnail for the large image.
+            mtime=image_object.mtime
         )
@@ -1,67 +1,136 @@
-import queue
+import collections
+import ctypes
 import threading
 import time
-from typing import List, Optional, Tuple, Any
+from typing import List, Optional, Tuple, Any, Dict, Set
 import numpy as np
-from PyQt5.QtCore import QTimer
+from OpenGL.GL import *
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 
 from models.connector_line import ConnectorLine
-from models.image_object import ImageObject
+from models.image_object import ImageObject, TextureCache
 from models.large_image_object import LargeImageObject
 from models.scene_object import SceneObject
 from models.types import *
 
-class Scene:
+class Scene(QObject):
     """
     Manages the collection of objects in the scene and coordinates updates,
     queries, and interactions with those objects.
     """
 
+    GRID_CELL_SIZE = 4.0  # edge length of the picking grid cells, about two default images
+    MIN_OBJECT_ROWS = 64  # initial capacity of the picking arrays
+
+    signal_updates_pending = pyqtSignal()
+    signal_scene_changed = pyqtSignal()  # the scene needs to be redrawn
+
     def __init__(self):
         """
         Initialize the Scene object, setting up the object list, a thread lock,
         an update queue, and a timer for processing updates.
         """
+        super().__init__()
         self.objects: List[SceneObject] = []
-        self.lock = threading.Lock()
-        self.update_queue = queue.Queue()
+        # Reentrant: the view holds the lock while its placement code queries the scene, which takes it again
+        self.lock = threading.RLock()
+        # Updates from any thread; appending to and popping from a deque are atomic, so producers need no lock
+        self.update_queue: collections.deque = collections.deque()
 
         self.connector_line = None
-
-        # Initialize the timer
-        self.update_timer = QTimer()
+        # Two position buffers take turns: one is held by the connector line, the other is refilled on the next change
+        self.connector_line_buffer: Optional[np.ndarray] = None
+        self.spare_connector_line_buffer: Optional[np.ndarray] = None
+
+        # Quads of all drawn images in one vertex array and buffer, rebuilt when images change
+        self.batch_vertex_arrays: List[np.ndarray] = []  # the vertex array of each image in the buffer
+        self.batch_vbo: Optional[int] = None
+        self.batch_draws: List[Tuple[int, int, int]] = []  # (texture_id, first, count) of each draw call
+        self.bounding_box_vbo: Optional[int] = None  # Edges of the bounding boxes of all selected images
+
+        # Positions and half sizes of the objects, one row per object, so picking tests the candidates in a few
+        # array operations. Rows are refreshed when their object was added, moved or resized.
+        # The rows of removed objects are reused, so row numbers stay valid in the grid below.
+        # The arrays may have spare rows at the end, reserved for objects about to be added.
+        self.object_positions = np.empty((0, 3))
+        self.object_half_sizes = np.empty((0, 2))
+        self.object_rows: Dict[SceneObject, int] = {}
+        self.row_objects: List[Optional[SceneObject]] = []
+        self.row_cells: List[Optional[Tuple[int, int, int, int]]] = []  # the grid cells each row is listed in
+        self.free_rows: List[int] = []
+        self.dirty_rows: Set[int] = set()  # rows to be filled in by update_object_bounds(), e.g. of added objects
+        # Uniform grid over the object plane: the rows of all objects overlapping each cell
+        self.grid: Dict[Tuple[int, int], Set[int]] = {}
+        # The images of the image sequence in scene order, and their rows; None until listed after a change
+        self.sequence_images: Optional[List[ImageObject]] = None
+        self.sequence_image_rows: Optional[np.ndarray] = None
+
+        # Initialize the timer. It only runs while updates are pending, so an idle scene causes no wakeups.
+        self.update_timer_enabled = False
+        self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self.run_process_updates)
+        # Updates may be queued from worker threads; the signal is delivered to the timer in the main thread
+        self.signal_updates_pending.connect(self.resume_update_timer)
 
     def start_update_timer(self, interval: int = 100) -> None:
         """
-        Start the update timer with a specified interval in milliseconds.
+        Enable the update timer with a specified interval in milliseconds. The timer runs whenever
+        updates are queued and stops again once the update queue is drained.
 
         Args:
             interval (int): The interval at which to process updates, in milliseconds. Defaults to 100 ms.
         """
-        self.update_timer.start(interval)
+        self.update_timer.setInterval(interval)
+        self.update_timer_enabled = True
+        self.resume_update_timer()
 
     def stop_update_timer(self) -> None:
         """Stop the update timer."""
+        self.update_timer_enabled = False
         self.update_timer.stop()
 
+    def resume_update_timer(self) -> None:
+        """
+        If the update timer is enabled and idle, apply the pending updates right away and start the timer
+        for the rest. Runs on the GUI thread; worker threads reach it through the queued signal_updates_pending.
+        """
+        if self.update_timer_enabled and not self.update_timer.isActive() and self.update_queue:
+            self.run_process_updates()
+            if self.update_queue:
+                self.update_timer.start()
+
     def sync_objects(self, obj_list: List[SceneObject]) -> None:
         """
         Synchronize the objects in the scene with a given list, adding new objects and removing missing ones.
+        Only the difference to the current scene is queued; pending updates are superseded by the given list.
 
         Args:
             obj_list (List[SceneObject]): The list of objects to synchronize with the scene.
         """
-        for obj in obj_list:
-            if obj not in self.objects:
-                self.add_object(obj)
-        for obj in self.objects:
-            if obj not in obj_list:
-                self.remove_object(obj)
+        with self.lock:
+            # Producers append without the lock, so drop only the entries queued so far; clear() could also
+            # discard an update appended by another thread while the diff is built
+            for _ in range(len(self.update_queue)):
+                self.update_queue.popleft()
+
+            current_objects = self.object_rows
+            new_objects = set(obj_list)
+            for obj in current_objects:
+                if obj not in new_objects:
+                    self.update_queue.append(('remove', obj))
+            for obj in obj_list:
+                if obj not in current_objects:
+                    self.update_queue.append(('add', obj))
+        self.signal_updates_pending.emit()
 
     def run_process_updates(self) -> None:
-        """Process updates when the timer fires, handling up to a specified maximum number of iterations."""
+        """
+        Process updates when the timer fires, handling up to a specified maximum number of iterations.
+        The timer is stopped once no updates are left.
+        """
         self.process_updates(max_iterations=50)
+        if not self.update_queue:
+            self.update_timer.stop()
 
     def add_connector_line_object(self, obj: ConnectorLine) -> None:
         """
@@ -71,6 +140,7 @@ class Scene:
             obj (ConnectorLine): The connector line object to be added.
         """
         self.connector_line = obj
+        self.connector_line_buffer = None  # the new line holds the positions it was created with
         self.add_object(self.connector_line)
 
     def remove_connector_line_object(self) -> None:
@@ -83,13 +153,23 @@ class Scene:
 
     def update_connector_line_positions(self, positions: np.ndarray) -> None:
         """
-        Update the positions of the connector line.
+        Update the positions of the connector line. This runs on every frame, so nothing is copied unless the
+        positions changed, and then they are copied into a reused buffer instead of a new array. The line keeps
+        its own copy, so callers may pass an array they modify later.
 
         Args:
             positions (np.ndarray): A list of new positions for the connector line.
         """
-        if self.connector_line:
-            self.connector_line.update_positions(positions)
+        if not self.connector_line or np.array_equal(positions, self.connector_line.positions):
+            return
+        buffer = self.spare_connector_line_buffer
+        if buffer is None or buffer.shape != positions.shape:
+            buffer = np.empty(positions.shape)
+        np.copyto(buffer, positions)
+        self.connector_line.update_positions(buffer)
+        # The line no longer refers to the buffer it held before
+        self.spare_connector_line_buffer = self.connector_line_buffer
+        self.connector_line_buffer = buffer
 
 
     def toggle_connector_line_visibility(self) -> None:
@@ -101,31 +181,30 @@ class Scene:
 
     def add_object(self, obj: SceneObject) -> None:
         """
-        Add an object to the scene.
+        Add an object to the scene. Objects already in the scene are skipped by process_updates().
 
         Args:
             obj (SceneObject): The object to add to the scene.
         """
-        with self.lock:
-            if obj not in self.objects:
-                self.update_queue.put(('add', obj))
+        self.update_queue.append(('add', obj))
+        self.signal_updates_pending.emit()
 
     def remove_object(self, obj: SceneObject) -> None:
         """
-        Remove an object from the scene.
+        Remove an object from the scene. Objects not in the scene are skipped by process_updates().
 
         Args:
             obj (SceneObject): The object to remove from the scene.
         """
-        with self.lock:
-            if obj in self.objects:
-                self.update_queue.put(('remove', obj))
+        self.update_queue.append(('remove', obj))
+        self.signal_updates_pending.emit()
 
     def remove_all_objects(self) -> None:
         """Remove all objects from the scene."""
         with self.lock:
-            for obj in self.objects:
-                self.update_queue.put(('remove', obj))
+            for obj in self.object_rows:
+                self.update_queue.append(('remove', obj))
+        self.signal_updates_pending.emit()
 
     def process_updates(self, max_iterations: int = 10) -> bool:
         """
@@ -137,170 +216,400 @@ class Scene:
         Returns:
             bool: True if updates were processed, False otherwise.
         """
-        updated = False
-        iterations = 0
-
-        while iterations < max_iterations:
+        # Take the whole batch off the queue and apply it in a single critical section. Draining under the lock
+        # keeps sync_objects() from computing its difference while a batch is half applied.
+        with self.lock:
+            pending = []
             try:
-                with self.lock:
-                    action, obj = self.update_queue.get_nowait()
-                    if action == 'add':
-                        self.objects.append(obj)
-                    elif action == 'remove':
-                        if obj in self.objects:
-                            self.objects.remove(obj)
-                self.update_queue.task_done()
-                updated = True
-                iterations += 1
-            except queue.Empty:
-                break
-
-        return updated
+                while len(pending) < max_iterations:
+                    pending.append(self.update_queue.popleft())
+            except IndexError:
+                pass
+            if not pending:
+                return False
+
+            # Grow the picking arrays once for the whole batch instead of once per added object
+            self.reserve_object_rows(sum(1 for action, _ in pending if action == 'add'))
+            removed_objects = set()  # still listed in self.objects until the end of the batch
+            for action, obj in pending:
+                # object_rows holds exactly the objects in the scene, so membership is a dict lookup
+                if action == 'add':
+                    if obj not in self.object_rows:
+                        if obj in removed_objects:
+                            removed_objects.discard(obj)  # re-added, so it keeps its place in self.objects
+                        else:
+                            self.objects.append(obj)
+                        self.add_object_row(obj)
+                        # redraw once the thumbnail, which is created in the background, is ready
+                        thumbnail_future = getattr(obj, 'thumbnail_future', None)
+                        if thumbnail_future is not None:
+                            thumbnail_future.add_done_callback(self.on_thumbnail_done)
+                elif action == 'remove':
+                    if obj in self.object_rows:
+                        self.remove_object_row(obj)
+                        removed_objects.add(obj)
+                    # Enlarged images are created for each view and never shown again
+                    if isinstance(obj, LargeImageObject):
+                        obj.release_texture()
+
+            if removed_objects:
+                # One pass instead of a list.remove() scan per removed object
+                self.objects = [obj for obj in self.objects if obj in self.object_rows]
+            self.sequence_images = None
+
+        self.signal_scene_changed.emit()
+        return True
+
+    def on_thumbnail_done(self, _future) -> None:
+        """Request a redraw when the thumbnail of an object is ready. Called on the thumbnail worker thread."""
+        self.signal_scene_changed.emit()
+
+    def render_objects(self, texture_upload_budget: int) -> bool:
+        """
+        Render all objects that have loaded thumbnails. Images are drawn together from one vertex buffer,
+        followed by their bounding boxes and texts; other objects render themselves.
 
-    def query(self, cam_pos: Vec3, click_pos_3d: Vec3) -> Optional[SceneObject]:
+        Args:
+            texture_upload_budget (int): The maximum number of image textures to upload in this frame.
+
+        Returns:
+            bool: True if images were skipped because the texture upload budget was used up.
         """
-        Query the scene to find the object that intersects with a ray originating from the camera.
+        TextureCache.delete_released_textures()
+        SceneObject.delete_released_gl_objects()
+
+        uploads_pending = False
+        images: List[ImageObject] = []
+        other_objects: List[SceneObject] = []
+        with self.lock:
+            for obj in self.objects:
+                if not obj.has_thumbnail:
+                    continue
+                if not isinstance(obj, ImageObject):
+                    other_objects.append(obj)
+                    continue
+                if obj.texture_id is None:
+                    if texture_upload_budget <= 0:
+                        uploads_pending = True
+                        continue
+                    texture_upload_budget -= 1
+                    if obj.load_texture() is None:
+                        continue
+                images.append(obj)
+
+            self.render_image_batch(images)
+            self.render_bounding_boxes([obj for obj in images if obj.selected])
+            for obj in images:
+                if obj.text:
+                    obj.render_text()
+            for obj in other_objects:
+                obj.render()
+
+        return uploads_pending
+
+    def prioritize_thumbnails_in_rectangle(self, min_xy: np.ndarray, max_xy: np.ndarray) -> None:
+        """
+        Move the queued thumbnail jobs of the images centered inside the given rectangle, usually the
+        visible part of the scene, to the front of the thumbnail queue. Only the objects in the grid cells
+        of the rectangle are looked at, as this runs on every frame while thumbnails are queued.
 
         Args:
-            cam_pos (Vec3): The camera's position in 3D space.
-            click_pos_3d (Vec3): The 3D position of the click in camera space.
+            min_xy (np.ndarray): The (x, y) minimum corner of the rectangle.
+            max_xy (np.ndarray): The (x, y) maximum corner of the rectangle.
+        """
+        if not ImageObject.queued_thumbnails:
+            return
+        with self.lock:
+            self.update_object_bounds()
+            rows = self.rows_in_rectangle(min_xy, max_xy)
+            centers = self.object_positions[rows, :2]
+            rows = rows[np.all((centers >= min_xy[:2]) & (centers <= max_xy[:2]), axis=1)]
+            visible = [obj for obj in (self.row_objects[row] for row in rows.tolist())
+                       if isinstance(obj, ImageObject) and not obj.has_thumbnail]
+        ImageObject.prioritize_thumbnails(visible)
 
-        Returns:
-            Optional[SceneObject]: The closest intersecting object, or None if no intersection occurs.
+    def render_image_batch(self, images: List[ImageObject]) -> None:
         """
-        # Calculate the ray direction
-        ray_direction = click_pos_3d / np.linalg.norm(click_pos_3d)
-        world_near = cam_pos
+        Draw the textured quads of the given images. Their vertex arrays are concatenated into one buffer,
+        which is only rebuilt when an image was added, removed, moved or resized. Images are sorted by texture
+        when the buffer is rebuilt, so all quads sharing a texture are drawn with a single glDrawArrays call,
+        and a frame without changes only binds the textures and issues the prepared draw calls.
 
-        # Check for intersection with each object
-        best_obj_candidate: Optional[SceneObject] = None
-        for obj in self.objects:
-            if isinstance(obj, SceneObject):
-                if self.ray_intersects_object(world_near, ray_direction, obj):
-                    if not best_obj_candidate or obj.position[2] > best_obj_candidate.position[2]:
-                        best_obj_candidate = obj
+        Args:
+            images (List[ImageObject]): The images to draw. Their textures must be loaded.
+        """
+        vertex_arrays = [obj.vertices for obj in images]
+        if len(vertex_arrays) != len(self.batch_vertex_arrays) or any(
+                a is not b for a, b in zip(vertex_arrays, self.batch_vertex_arrays)):
+            self.batch_vertex_arrays = vertex_arrays
+            self.rebuild_image_batch(images)
+
+        if not self.batch_draws:
+            return
+
+        glEnable(GL_TEXTURE_2D)
+        glColor3f(1.0, 1.0, 1.0)
 
-        return best_obj_candidate
+        # Interleaved x, y, z, u, v float32 vertices
+        stride = vertex_arrays[0].strides[0]
+        glBindBuffer(GL_ARRAY_BUFFER, self.batch_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, stride, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, stride, ctypes.c_void_p(3 * vertex_arrays[0].itemsize))
 
-    def ray_intersects_object(self, ray_origin: Vec3, ray_direction: Vec3, obj: SceneObject) -> bool:
+        for texture_id, first, count in self.batch_draws:
+            glBindTexture(GL_TEXTURE_2D, texture_id)
+            glDrawArrays(GL_TRIANGLES, first, count)
+
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+
+    def render_bounding_boxes(self, objects: List[SceneObject]) -> None:
         """
-        Determine if a ray intersects with a given object in the scene.
+        Draw the bounding boxes of the given objects with a single call. The unit cube edges are
+        stretched over each bounding box on the CPU and streamed into one vertex buffer.
 
         Args:
-            ray_origin (Vec3): The origin of the ray.
-            ray_direction (Vec3): The direction of the ray.
-            obj (SceneObject): The object to check for intersection.
+            objects (List[SceneObject]): The objects whose bounding boxes to draw.
+        """
+        if not objects:
+            return
 
-        Returns:
-            bool: True if the ray intersects the object, False otherwise.
+        corners = np.array([obj.get_bounding_box() for obj in objects], dtype=np.float32)  # (n, 2, 3) max, min
+        extents = corners[:, 0] - corners[:, 1]
+        vertices = corners[:, None, 1] + SceneObject.UNIT_CUBE_EDGES[None] * extents[:, None]
+        if self.bounding_box_vbo is None:
+            self.bounding_box_vbo = glGenBuffers(1)
+
+        glColor3f(1.0, 1.0, 1.0)  # White color for the bounding box
+        glLineWidth(4.0)  # Thicker lines for visibility
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.bounding_box_vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(GL_LINES, 0, vertices.shape[0] * vertices.shape[1])
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def rebuild_image_batch(self, images: List[ImageObject]) -> None:
         """
-        object_plane_distance = -ray_origin[2]  # objects are placed at z=0
-        intersection_point = ray_direction * object_plane_distance / ray_direction[2] - ray_origin
+        Fill the batch vertex buffer with the quads of the given images, sorted by texture, and
+        prepare one draw call for each run of quads sharing a texture.
 
-        # Check if the intersection point is within the object's bounds
-        return (obj.position[0] - obj.size[0] / 2 <= intersection_point[0] <= obj.position[0] + obj.size[0] / 2 and
-                obj.position[1] - obj.size[1] / 2 <= intersection_point[1] <= obj.position[1] + obj.size[1] / 2)
+        Args:
+            images (List[ImageObject]): The images to draw. Their textures must be loaded.
+        """
+        self.batch_draws = []
+        if not images:
+            return
+
+        images = sorted(images, key=lambda obj: obj.texture_id)
+        vertices = np.concatenate([obj.vertices for obj in images])
+        if self.batch_vbo is None:
+            self.batch_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.batch_vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        first = 0
+        for obj in images:
+            count = len(obj.vertices)
+            if self.batch_draws and self.batch_draws[-1][0] == obj.texture_id:
+                texture_id, run_first, run_count = self.batch_draws[-1]
+                self.batch_draws[-1] = (texture_id, run_first, run_count + count)
+            else:
+                self.batch_draws.append((obj.texture_id, first, count))
+            first += count
 
-    def inside_rectangle(self, obj: SceneObject, start: Vec3, end: Vec3) -> bool:
+    def reserve_object_rows(self, count: int) -> None:
         """
-        Check if an object is inside or overlaps with a specified rectangular region.
+        Make sure the picking arrays have room for count more objects. They grow to at least twice their
+        size, so adding objects one at a time copies the arrays only a logarithmic number of times.
 
         Args:
-            obj (SceneObject): The object to check.
-            start (Vec3): The starting corner of the rectangle.
-            end (Vec3): The opposite corner of the rectangle.
+            count (int): The number of objects about to be added.
+        """
+        capacity = len(self.object_positions)
+        required = len(self.row_objects) - len(self.free_rows) + count
+        if required > capacity:
+            missing = max(required, 2 * capacity, self.MIN_OBJECT_ROWS) - capacity
+            self.object_positions = np.concatenate((self.object_positions, np.zeros((missing, 3))))
+            self.object_half_sizes = np.concatenate((self.object_half_sizes, np.zeros((missing, 2))))
 
-        Returns:
-            bool: True if the object is inside or overlaps with the rectangle, False otherwise.
+    def add_object_row(self, obj: SceneObject) -> None:
+        """
+        Assign a row of the picking arrays to an object. It is filled in by update_object_bounds().
+
+        Args:
+            obj (SceneObject): The object added to the scene.
         """
-        # Calculate the object's AABB
-        verts = obj.vertices if isinstance(obj.vertices, np.ndarray) else np.array([v[0] for v in obj.vertices])
-        obj_minx, obj_maxx = np.min(verts[:, 0]), np.max(verts[:, 0])
-        obj_miny, obj_maxy = np.min(verts[:, 1]), np.max(verts[:, 1])
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.row_objects[row] = obj
+        else:
+            row = len(self.row_objects)
+            self.reserve_object_rows(1)
+            self.row_objects.append(obj)
+            self.row_cells.append(None)
+        self.object_rows[obj] = row
+        self.dirty_rows.add(row)
 
-        # Calculate the rectangle's bounds
-        rect_minx, rect_maxx = min(start[0], end[0]), max(start[0], end[0])
-        rect_miny, rect_maxy = min(start[1], end[1]), max(start[1], end[1])
+    def remove_object_row(self, obj: SceneObject) -> None:
+        """
+        Release the row of an object removed from the scene and take it out of the grid.
 
-        # Check for AABB overlap (bounding box intersection)
-        overlap_x = obj_maxx >= rect_minx and obj_minx <= rect_maxx
-        overlap_y = obj_maxy >= rect_miny and obj_miny <= rect_maxy
+        Args:
+            obj (SceneObject): The object removed from the scene.
+        """
+        row = self.object_rows.pop(obj)
+        self.set_row_cells(row, None)
+        self.row_objects[row] = None
+        self.dirty_rows.discard(row)
+        self.free_rows.append(row)
 
-        if overlap_x and overlap_y:
-            return True
+    def set_row_cells(self, row: int, cells: Optional[Tuple[int, int, int, int]]) -> None:
+        """
+        Move a row to the given range of grid cells.
 
-        # Finally, is start and end entirely contained inside the object
-        if  (obj_minx < rect_minx < obj_maxx and obj_miny < rect_miny < obj_maxy) and (
-                obj_minx < rect_maxx < obj_maxx and obj_miny < rect_maxy < obj_maxy):
-            return True
+        Args:
+            row (int): The row of the object.
+            cells (Optional[Tuple[int, int, int, int]]): The (min_i, min_j, max_i, max_j) cells the object overlaps,
+                or None to take it out of the grid.
+        """
+        old_cells = self.row_cells[row]
+        if cells == old_cells:
+            return
+        if old_cells is not None:
+            for cell in self.cells_in_range(*old_cells):
+                rows = self.grid[cell]
+                rows.discard(row)
+                if not rows:
+                    del self.grid[cell]
+        if cells is not None:
+            for cell in self.cells_in_range(*cells):
+                self.grid.setdefault(cell, set()).add(row)
+        self.row_cells[row] = cells
+
+    def cells_in_range(self, min_i: int, min_j: int, max_i: int, max_j: int) -> List[Tuple[int, int]]:
+        """
+        List the grid cells in a range, both ends included.
 
-        # Optionally, check for edge intersection (this is more expensive but accurate)
-        if self.edges_intersect(verts, start, end):
-            return True
+        Args:
+            min_i (int): The first column.
+            min_j (int): The first row.
+            max_i (int): The last column.
+            max_j (int): The last row.
 
-        return False
+        Returns:
+            List[Tuple[int, int]]: The (i, j) indices of the cells.
+        """
+        return [(i, j) for i in range(min_i, max_i + 1) for j in range(min_j, max_j + 1)]
 
-    def edges_intersect(self, verts: np.ndarray, start: Vec3, end: Vec3) -> bool:
+    def cell_range(self, min_xy: np.ndarray, max_xy: np.ndarray) -> Tuple[int, int, int, int]:
         """
-        Check if any edge of the object intersects with the rectangle.
+        Get the range of grid cells overlapped by a rectangle.
 
         Args:
-            verts (np.ndarray): The vertices of the object.
-            start (Vec3): The starting corner of the rectangle.
-            end (Vec3): The opposite corner of the rectangle.
+            min_xy (np.ndarray): The (x, y) minimum corner of the rectangle.
+            max_xy (np.ndarray): The (x, y) maximum corner of the rectangle.
 
         Returns:
-            bool: True if any edge intersects, False otherwise.
+            Tuple[int, int, int, int]: The (min_i, min_j, max_i, max_j) cells.
         """
-        rect_edges = [
-            (start, (end[0], start[1])),
-            ((end[0], start[1]), end),
-            (end, (start[0], end[1])),
-            ((start[0], end[1]), start)
-        ]
+        min_i, min_j = np.floor(np.asarray(min_xy[:2]) / self.GRID_CELL_SIZE).astype(int).tolist()
+        max_i, max_j = np.floor(np.asarray(max_xy[:2]) / self.GRID_CELL_SIZE).astype(int).tolist()
+        return min_i, min_j, max_i, max_j
 
-        # Loop over each edge of the object and the rectangle
-        for i in range(len(verts)):
-            obj_edge_start = verts[i]
-            obj_edge_end = verts[(i + 1) % len(verts)]
-            for rect_edge_start, rect_edge_end in rect_edges:
-                if self.do_edges_intersect(obj_edge_start, obj_edge_end, rect_edge_start, rect_edge_end):
-                    return True
+    def rows_in_rectangle(self, min_xy: np.ndarray, max_xy: np.ndarray) -> np.ndarray:
+        """
+        Collect the rows of all objects listed in the grid cells a rectangle overlaps.
+        Must be called with the lock held, after update_object_bounds().
 
-        return False
+        Args:
+            min_xy (np.ndarray): The (x, y) minimum corner of the rectangle.
+            max_xy (np.ndarray): The (x, y) maximum corner of the rectangle.
 
-    def do_edges_intersect(self, p1, q1, p2, q2) -> bool:
+        Returns:
+            np.ndarray: The sorted candidate rows.
+        """
+        min_i, min_j, max_i, max_j = self.cell_range(min_xy, max_xy)
+        if (max_i - min_i + 1) * (max_j - min_j + 1) > len(self.grid):
+            # The rectangle covers more cells than are occupied, so look at the occupied ones instead
+            cells = [rows for (i, j), rows in self.grid.items() if min_i <= i <= max_i and min_j <= j <= max_j]
+        else:
+            cells = [self.grid[cell] for cell in self.cells_in_range(min_i, min_j, max_i, max_j) if cell in self.grid]
+        if not cells:
+            return np.empty(0, dtype=np.intp)
+        return np.array(sorted(set().union(*cells)), dtype=np.intp)
+
+    def update_object_bounds(self) -> None:
+        """
+        Refresh the rows and grid cells of the objects that were added, moved or resized since they were
+        computed. Only those rows are visited, so queries and frames cost nothing for objects that stayed put.
+        Must be called with the lock held.
+        """
+        with SceneObject.moved_objects_lock:
+            moved_objects, SceneObject.moved_objects = SceneObject.moved_objects, set()
+        for obj in moved_objects:
+            row = self.object_rows.get(obj)
+            if row is not None:  # objects moved outside the scene get a fresh row when they are added
+                self.dirty_rows.add(row)
+
+        for row in self.dirty_rows:
+            obj = self.row_objects[row]
+            self.object_positions[row] = obj.position
+            self.object_half_sizes[row] = obj.size[:2] * 0.5
+            center = self.object_positions[row, :2]
+            half_size = self.object_half_sizes[row]
+            self.set_row_cells(row, self.cell_range(center - half_size, center + half_size))
+        self.dirty_rows.clear()
+
+    def query(self, cam_pos: Vec3, click_pos_3d: Vec3) -> Optional[SceneObject]:
         """
-        Helper function to check if two line segments (p1q1 and p2q2) intersect.
+        Query the scene to find the object that intersects with a ray originating from the camera.
+        The intersection of the ray with the object plane is tested against the objects of its grid cell at once.
 
         Args:
-            p1, q1: Start and end points of the first line segment.
-            p2, q2: Start and end points of the second line segment.
+            cam_pos (Vec3): The camera's position in 3D space.
+            click_pos_3d (Vec3): The 3D position of the click in camera space.
 
         Returns:
-            bool: True if the segments intersect, False otherwise.
+            Optional[SceneObject]: The closest intersecting object, or None if no intersection occurs.
         """
+        intersection_point = self.intersect_object_plane(cam_pos, click_pos_3d)
 
-        def orientation(p, q, r):
-            val = (q[1] - p[1]) * (r[0] - q[0]) - (q[0] - p[0]) * (r[1] - q[1])
-            if val == 0:
-                return 0  # Collinear
-            elif val > 0:
-                return 1  # Clockwise
-            else:
-                return 2  # Counterclockwise
+        with self.lock:
+            self.update_object_bounds()
+            # Objects are listed in every cell they overlap, so the cell of the point holds all candidates
+            rows = self.rows_in_rectangle(intersection_point, intersection_point)
+            offsets = np.abs(self.object_positions[rows, :2] - intersection_point[:2])
+            hits = rows[np.all(offsets <= self.object_half_sizes[rows], axis=1)]
+            if len(hits) == 0:
+                return None
+            # The topmost object wins
+            return self.row_objects[hits[np.argmax(self.object_positions[hits, 2])]]
 
-        o1 = orientation(p1, q1, p2)
-        o2 = orientation(p1, q1, q2)
-        o3 = orientation(p2, q2, p1)
-        o4 = orientation(p2, q2, q1)
+    def intersect_object_plane(self, cam_pos: Vec3, click_pos_3d: Vec3) -> np.ndarray:
+        """
+        Intersect the ray from the camera through a click position with the object plane. The ray direction
+        is scaled to reach the plane, so it does not need to be normalized first.
 
-        # General case
-        if o1 != o2 and o3 != o4:
-            return True
+        Args:
+            cam_pos (Vec3): The camera's position in 3D space.
+            click_pos_3d (Vec3): The 3D position of the click in camera space.
 
-        # Special cases (collinear points)
-        return False
+        Returns:
+            np.ndarray: The (x, y, z) intersection point.
+        """
+        scale = -float(cam_pos[2]) / float(click_pos_3d[2])  # objects are placed at z=0
+        return np.array((float(click_pos_3d[0]) * scale - float(cam_pos[0]),
+                         float(click_pos_3d[1]) * scale - float(cam_pos[1]),
+                         float(click_pos_3d[2]) * scale - float(cam_pos[2])))
 
     def query_inside(self, cam_pos: Vec3, click_start_3d: Vec3, click_end_3d: Vec3) -> List[
         SceneObject]:
@@ -315,13 +624,14 @@ class Scene:
         Returns:
             List[SceneObject]: A list of objects inside the rectangular region.
         """
-        # Calculate the ray direction
-        start_ray_direction = click_start_3d / np.linalg.norm(click_start_3d)
-        end_ray_direction = click_end_3d / np.linalg.norm(click_end_3d)
-        object_plane_distance = -cam_pos[2]  # objects are placed at z=0
+        # A rectangle that was never dragged open (click positions are in pixels) selects nothing;
+        # the click itself is handled by query()
+        if (abs(float(click_start_3d[0]) - float(click_end_3d[0])) < 1.0 and
+                abs(float(click_start_3d[1]) - float(click_end_3d[1])) < 1.0):
+            return []
 
-        start = start_ray_direction * object_plane_distance / start_ray_direction[2] - cam_pos
-        end = end_ray_direction * object_plane_distance / end_ray_direction[2] - cam_pos
+        start = self.intersect_object_plane(cam_pos, click_start_3d)
+        end = self.intersect_object_plane(cam_pos, click_end_3d)
 
         # Check for intersection with each object
         return self.query_inside_rectangle(start,end)
@@ -337,34 +647,95 @@ class Scene:
         Returns:
             List[SceneObject]: A list of objects inside the rectangular region.
         """
-        # do fast candidate check using center position check on slightly larger rectangle
-        # tstart = time.time()
-        centers = np.vstack(list(obj.position for obj in self.objects))
-        # print(f"Centers took {time.time() - tstart}s")
+        with self.lock:
+            return [self.row_objects[row] for row in self.query_inside_rectangle_rows(start, end).tolist()]
+
+    def query_inside_rectangle_rows(self, start: Vec3, end: Vec3) -> np.ndarray:
+        """
+        Like query_inside_rectangle(), but return the rows of the objects in the picking arrays, for callers
+        that only need their positions or sizes. The rows stay valid only while the caller holds the lock.
 
-        rect_minx, rect_maxx = min(start[0], end[0])-1, max(start[0], end[0])+1 # magic numbers!!
-        rect_miny, rect_maxy = min(start[1], end[1])-1, max(start[1], end[1])+1 # magic numbers!!
+        Args:
+            start (Vec3): The starting corner of the rectangle.
+            end (Vec3): The opposite corner of the rectangle.
 
-        x_overlapp = (rect_minx <= centers[:, 0]) & (centers[:, 0] <= rect_maxx)
-        y_overlapp = (rect_miny <= centers[:, 1]) & (centers[:, 1] <= rect_maxy)
-        idx = np.where(x_overlapp & y_overlapp)[0]
-        candidates = set(self.objects[_] for _ in idx) if len(idx)>0 else []
+        Returns:
+            np.ndarray: The rows of the objects inside the rectangular region, in ascending order.
+        """
+        rect_min = np.minimum(start[:2], end[:2])
+        rect_max = np.maximum(start[:2], end[:2])
 
-        # Check for intersection with each object
-        res = list(obj for obj in candidates if isinstance(obj, SceneObject) and self.inside_rectangle(obj, start, end))
-        # print(f"Select took {time.time() - tstart}s and found {len(res)} objs")
-        return res
+        with self.lock:
+            # Axis aligned objects are inside or overlap the rectangle exactly if their bounding boxes overlap
+            self.update_object_bounds()
+            rows = self.rows_in_rectangle(rect_min, rect_max)
+            object_min = self.object_positions[rows, :2] - self.object_half_sizes[rows]
+            object_max = self.object_positions[rows, :2] + self.object_half_sizes[rows]
+            return rows[np.all((object_max >= rect_min) & (object_min <= rect_max), axis=1)]
+
+    def move_objects(self, objects: List[SceneObject], displacement: np.ndarray) -> None:
+        """
+        Move several objects by the same displacement, e.g. when dragging a selection. The quads of all
+        images are rebuilt together in one array operation instead of one create_vertices() call per image.
 
+        Args:
+            objects (List[SceneObject]): The objects to move.
+            displacement (np.ndarray): The (x, y, z) displacement.
+        """
+        images = []
+        for obj in objects:
+            if isinstance(obj, ImageObject):
+                images.append(obj)
+            elif isinstance(obj, SceneObject):
+                obj.update_position(displacement)
+        if not images:
+            return
+
+        positions = np.array([obj.position for obj in images]) + displacement
+        sizes = np.array([obj.size[:2] for obj in images], dtype=np.float32)
+        vertices = np.repeat(ImageObject.UNIT_QUAD[None], len(images), axis=0)
+        vertices[:, :, :2] *= sizes[:, None]
+        vertices[:, :, :3] += positions[:, None]
+        for obj, position, quad in zip(images, positions, vertices):
+            obj.position = position
+            obj.vertices = quad
+            obj.mark_moved()
+
+    def update_sequence_images(self) -> None:
+        """
+        List the images of the image sequence, i.e. all images except folders and the enlarged image, in scene
+        order, together with their rows in the picking arrays. They are only listed again after the objects of
+        the scene changed. Must be called with the lock held.
+        """
+        if self.sequence_images is None:
+            self.sequence_images = [obj for obj in self.objects if isinstance(obj, ImageObject)
+                                    and obj.object_type == "image" and not isinstance(obj, LargeImageObject)]
+            self.sequence_image_rows = np.array([self.object_rows[obj] for obj in self.sequence_images],
+                                                dtype=np.intp)
 
     def get_object_positions(self) -> np.ndarray:
         """
-        Extracts the center coordinates from the objects in the scene.
+        Extracts the center coordinates from the images of the image sequence. The positions are gathered from
+        the picking arrays in one operation instead of being collected from the objects one by one.
 
         Returns:
-            np.ndarray: An array of shape (n, 2) where n is the number of objects.
+            np.ndarray: An array of shape (n, 3) where n is the number of images.
         """
-        return np.array([obj.position for obj in self.objects if isinstance(obj,ImageObject) and obj.object_type=="image" and not isinstance(obj,LargeImageObject)])
+        with self.lock:
+            self.update_object_bounds()
+            self.update_sequence_images()
+            return self.object_positions[self.sequence_image_rows]
 
     def get_image_object_by_index(self, index: int) -> Optional[ImageObject]:
-        objects = [obj for obj in self.objects if isinstance(obj,ImageObject) and obj.object_type=="image" and not isinstance(obj,LargeImageObject)]
-        return objects[index]
\ No newline at end of file
+        """
+        Get an image of the image sequence by its index in get_object_positions().
+
+        Args:
+            index (int): The index of the image.
+
+        Returns:
+            Optional[ImageObject]: The image.
+        """
+        with self.lock:
+            self.update_sequence_images()
+            return self.sequence_images[index]
@@ -1,25 +1,38 @@
+import concurrent.futures
 import json
+import os
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Optional
 
 import numpy as np
-from PyQt5.QtCore import pyqtSignal, QObject
+from PyQt5.QtCore import QObject
 from numpy import arange
 
 from models.image_object import ImageObject
 
+# Lower-case file extensions of the image formats shown in the scene
+SUPPORTED_FORMATS = frozenset({'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif'})
+
 
 class SceneManager(QObject):
     """
     Manages the state of the scene, including loading and saving image and folder objects,
-    scanning directories, and emitting signals to update the scene.
+    and scanning directories.
     """
 
-    signal_add_image = pyqtSignal(ImageObject)
+    # Thread pool for stat calls on large folders; stat releases the GIL, so I/O requests overlap
+    stat_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+    parallel_stat_threshold = 256
+    stat_chunk_size = 64
+    folder_cache_size = 8  # number of recently visited folders kept in memory
 
     def __init__(self, path: Path, asset_path: Path):
         """
-        Initialize the SceneManager, load the scene state, and scan the directory.
+        Initialize the SceneManager for a directory. The scene state is loaded and the directory
+        scanned by load_folder(), which may run on a worker thread.
 
         Args:
             path (Path): The path to the directory containing the scene.
@@ -27,13 +40,38 @@ class SceneManager(QObject):
         super().__init__()
         self.path = Path(path)
         self.asset_path = Path(asset_path)
+        self.scan_cancelled = threading.Event()
+        self.default_image_size = (2.0, 2.0 * 9.0 / 16.0)
+        self.default_image_spacing = tuple(1.125 * _ for _ in self.default_image_size)
+
+        # Recently visited folders, keyed by the interned path string:
+        # folder_key -> (images, folders, folder_mtime_ns, min_pos, max_pos)
+        self.folder_cache: "OrderedDict[str, Tuple[List[ImageObject], List[ImageObject], Optional[int], np.ndarray, np.ndarray]]" = OrderedDict()
+
+        self.folder_loaded = False  # prevents saving an empty state before load_folder() ran
+        self.images: List[ImageObject] = []
+        self.folders: List[ImageObject] = []
+
+    def load_folder(self, path: Path) -> None:
+        """
+        Load the scene state of a folder from its .ppyles folder and scan it for changes.
+
+        Every image object is created anew here, and its thumbnail is recreated if the image is newer.
+        Later rescans, and switching back to a folder in the folder cache, only compare the folder's
+        modification time. Editing an image in place does not change it, so such an image keeps its old
+        thumbnail until the folder is loaded again, e.g. after a restart.
+
+        Args:
+            path (Path): The path to the directory containing the scene.
+        """
+        self.path = Path(path)
+        self.folder_key = self.make_folder_key(self.path)
         self.ppyles_folder = self.path / '.ppyles'
         self.state_file = self.ppyles_folder / 'state.json'
+        self.folder_mtime_ns = None  # folder mtime at the last completed scan
 
         self.min_pos = np.array((0.0, 0.0, 0.0))
         self.max_pos = np.array((0.0, 0.0, 0.0))
-        self.default_image_size = (2.0, 2.0 * 9.0 / 16.0)
-        self.default_image_spacing = tuple(1.125 * _ for _ in self.default_image_size)
 
         self.images: List[ImageObject] = []
         self.folders: List[ImageObject] = [
@@ -51,7 +89,69 @@ class SceneManager(QObject):
         # fix for packaged assets
         for fobj in self.folders:
             fobj.image_path = self.asset_path / "assets" / fobj.image_path.name
+        self.folder_loaded = True
+        self.save_state()
+
+    @staticmethod
+    def make_folder_key(path: Path) -> str:
+        """
+        Build the folder cache key of a path. Interned strings hash once and compare by identity,
+        which is cheaper than hashing and comparing Path objects on every cache probe.
+
+        Args:
+            path (Path): The resolved path to the directory.
+
+        Returns:
+            str: The interned path string.
+        """
+        return sys.intern(str(path))
+
+    def switch_path(self, new_path: Path, folder_key: Optional[str] = None) -> None:
+        """
+        Switch the scene to another folder. The current folder is saved and kept in the folder cache,
+        so switching back to it reuses the already built objects and only rescans for changes.
+        If the new folder can not be loaded, the current folder is restored and the exception is re-raised.
+
+        Args:
+            new_path (Path): The resolved path to the directory to switch to.
+            folder_key (str, optional): The path as a string, if the caller already has it. Defaults to None.
+        """
+        self.cancel_scan()
         self.save_state()
+        old_path = self.path
+        old_key = self.folder_key
+        self.folder_cache[old_key] = (self.images, self.folders, self.folder_mtime_ns, self.min_pos, self.max_pos)
+        self.folder_cache.move_to_end(old_key)
+
+        try:
+            cached_folder = self.folder_cache.pop(self.make_folder_key(folder_key or new_path), None)
+            if cached_folder is None:
+                self.load_folder(new_path)
+            else:
+                self.restore_cached_folder(Path(new_path), cached_folder)
+                self.scan_directory()
+        except Exception:
+            self.restore_cached_folder(old_path, self.folder_cache.pop(old_key))
+            raise
+
+        while len(self.folder_cache) > self.folder_cache_size:
+            _, (images, folders, *_) = self.folder_cache.popitem(last=False)
+            for obj in images + folders:
+                obj.release_texture()
+
+    def restore_cached_folder(self, path: Path, cached_folder: Tuple) -> None:
+        """
+        Restore the state of a folder from the folder cache.
+
+        Args:
+            path (Path): The path to the cached folder.
+            cached_folder (Tuple): The cache entry of the folder.
+        """
+        self.path = path
+        self.folder_key = self.make_folder_key(self.path)
+        self.ppyles_folder = self.path / '.ppyles'
+        self.state_file = self.ppyles_folder / 'state.json'
+        self.images, self.folders, self.folder_mtime_ns, self.min_pos, self.max_pos = cached_folder
 
     def __del__(self):
         """Ensure the state is saved when the SceneManager is deleted."""
@@ -61,33 +161,61 @@ class SceneManager(QObject):
         """
         Scan the directory for images and subdirectories. Updates the scene
         with new images and folders, and removes any missing ones.
+
+        The scan is skipped if the folder's modification time is unchanged since the last scan,
+        since adding, removing or renaming an entry always updates it. Images edited in place are
+        not noticed; see load_folder().
         """
-        supported_formats = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif')
+        folder_mtime_ns = os.stat(self.path).st_mtime_ns
+        if folder_mtime_ns == self.folder_mtime_ns:
+            return
 
         # 1. Find all folder contents (non-recursive)
         # 2. Split sets into new and old images. Old images already have a position and size; new ones don't.
-        old_image_names = [img.image_path.name for img in self.images]
-        old_folder_names = [folder.text for folder in self.folders]
+        old_image_names = {img.image_path.name for img in self.images}
+        old_folder_names = {folder.text for folder in self.folders}
 
-        all_image_names_in_folder = []
-        all_folder_names_in_folder = [".."]
+        all_image_names_in_folder = set()
+        all_folder_names_in_folder = {".."}
         new_image_names = []
         new_folder_names = []
 
-        for item in self.path.iterdir():
-            if item.is_file() and item.suffix.lower() in supported_formats:
-                new_image = item.name
-                all_image_names_in_folder.append(new_image)
-                if new_image not in old_image_names:
-                    new_image_names.append(new_image)
-            elif item.is_dir() and item.name != '.ppyles':
-                new_folder = item.name
-                all_folder_names_in_folder.append(new_folder)
-                if new_folder not in old_folder_names:
-                    new_folder_names.append(new_folder)
+        # os.scandir yields the file type with the directory listing, so only images need an extra stat call
+        self.scan_cancelled.clear()
+        image_entries = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name == '.ppyles':
+                        continue
+                    new_folder = entry.name
+                    all_folder_names_in_folder.add(new_folder)
+                    if new_folder not in old_folder_names:
+                        new_folder_names.append(new_folder)
+                    continue
+
+                new_image = entry.name
+                dot = new_image.rfind('.')
+                if dot >= 0 and new_image[dot:].lower() in SUPPORTED_FORMATS and entry.is_file():
+                    image_entries.append(entry)
+                    all_image_names_in_folder.add(new_image)
+                    if new_image not in old_image_names:
+                        new_image_names.append(new_image)
+
+        image_mtimes = self.stat_image_entries(image_entries)
+        if self.scan_cancelled.is_set():
+            return
 
         # Remove anything that is no longer present to avoid crashes on load
+        for img in self.images:
+            if img.image_path.name not in all_image_names_in_folder:
+                img.release_texture()
+        for folder in self.folders:
+            if folder.text not in all_folder_names_in_folder:
+                folder.release_texture()
         self.images = [img for img in self.images if img.image_path.name in all_image_names_in_folder]
+        for img in self.images:
+            img.mtime = image_mtimes[img.image_path.name]
         self.folders = [folder for folder in self.folders if folder.text in all_folder_names_in_folder]
 
         # Sort new items
@@ -98,7 +226,6 @@ class SceneManager(QObject):
         new_grid_offset = np.array((self.max_pos[0] + self.default_image_spacing[0], self.min_pos[1], 0.0))
         new_object_count = len(new_image_names) + len(new_folder_names)
         if new_object_count > 0:
-            self.redraw_scene = True
             grid_dim = int(np.ceil(np.sqrt(new_object_count)))
             u_, v_ = np.meshgrid(arange(grid_dim), arange(grid_dim))
             u_ = u_.flatten()
@@ -116,39 +243,74 @@ class SceneManager(QObject):
                 w, h = self.default_image_spacing
                 new_pos = np.array((u_[k + len(new_folder_names)] * w, -v_[k + len(new_folder_names)] * h, 0.0)) + new_grid_offset
                 new_image_object = ImageObject(
-                    new_image_name, new_pos, self.default_image_size, new_image_name, parent_dir=self.path, object_type="image"
+                    new_image_name, new_pos, self.default_image_size, new_image_name, parent_dir=self.path, object_type="image",
+                    mtime=image_mtimes[new_image_name]
                 )
                 self.images.append(new_image_object)
 
+        self.folder_mtime_ns = folder_mtime_ns
         self.save_state()
 
-    def load_objects_into_scene(self) -> None:
-        """Load all folders and images into the scene by emitting signals."""
-        for folder in self.folders:
-            self.signal_add_image.emit(folder)
-        for img in self.images:
-            self.signal_add_image.emit(img)
+    def stat_image_entries(self, image_entries: List[os.DirEntry]) -> Dict[str, float]:
+        """
+        Read the modification times of the scanned image files. Large folders are stat'ed in parallel
+        chunks on the stat thread pool; the scan stops early once cancel_scan() was called.
+
+        Args:
+            image_entries (List[os.DirEntry]): The directory entries of the images found by the scan.
+
+        Returns:
+            Dict[str, float]: The modification time of each image, keyed by file name.
+        """
+        def stat_chunk(chunk: List[os.DirEntry]) -> List[Tuple[str, float]]:
+            if self.scan_cancelled.is_set():
+                return []
+            return [(entry.name, entry.stat().st_mtime) for entry in chunk]
+
+        if len(image_entries) < self.parallel_stat_threshold:
+            return dict(stat_chunk(image_entries))
+
+        chunks = [image_entries[k:k + self.stat_chunk_size] for k in range(0, len(image_entries), self.stat_chunk_size)]
+        image_mtimes = {}
+        for result in self.stat_executor.map(stat_chunk, chunks):
+            image_mtimes.update(result)
+        return image_mtimes
+
+    def cancel_scan(self) -> None:
+        """Cancel a scan that is currently in progress. The scene state is left unchanged."""
+        self.scan_cancelled.set()
+
+    def shutdown_executors(self) -> None:
+        """
+        Shut down the stat and thumbnail thread pools without waiting for queued jobs, so exiting
+        the application does not wait for the thumbnails of a large folder. Call once no scan runs anymore.
+        """
+        self.stat_executor.shutdown(wait=False, cancel_futures=True)
+        ImageObject.shutdown_executor()
 
     def save_state(self) -> None:
         """Save the current state to the .ppyles folder."""
+        if not self.folder_loaded:
+            return
         images = [img.to_dict() for img in self.images]
         folders = [folder.to_dict(preserve_image_path=True) for folder in self.folders]
         state = {
             'images': images,
-            'folders': folders
+            'folders': folders,
+            'folder_mtime_ns': self.folder_mtime_ns
         }
         with self.state_file.open('w') as f:
             json.dump(state, f, indent=4)
 
     def load_state(self) -> None:
         """Load the state from the .ppyles folder."""
-        self.redraw_scene = True
         if self.state_file.exists():
             try:
                 with self.state_file.open('r') as f:
                     state = json.load(f)
                     self.images = [ImageObject(**img, parent_dir=self.path) for img in state.get('images', [])]
                     self.folders = [ImageObject(**folder) for folder in state.get('folders', [])]
+                    self.folder_mtime_ns = state.get('folder_mtime_ns')
             except json.JSONDecodeError as e:
                 print(f"Failed to load state file {self.state_file}: {e}")
             except Exception as e:
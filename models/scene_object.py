@@ -1,7 +1,9 @@
+import ctypes
+import threading
+
 import numpy as np
 from OpenGL.GL import *
-from PIL import Image, ImageDraw, ImageFont
-from typing import Optional, Tuple
+from typing import List, Optional, Set, Tuple
 
 from models.types import *
 
@@ -11,6 +13,26 @@ class SceneObject:
     displaying text, and managing its position and size.
     """
 
+    # Corners of a quad of unit width and height, centered at the origin
+    UNIT_VERTICES = np.array(((-0.5, -0.5, 0.0), (0.5, -0.5, 0.0), (0.5, 0.5, 0.0), (-0.5, 0.5, 0.0)),
+                             dtype=np.float32)
+
+    # The 12 edges of the unit cube as pairs of line end points, stretched over the bounding box when drawn
+    UNIT_CUBE_EDGES = np.array([
+        (0, 0, 0), (1, 0, 0), (1, 0, 0), (1, 1, 0), (1, 1, 0), (0, 1, 0), (0, 1, 0), (0, 0, 0),  # front face
+        (0, 0, 1), (1, 0, 1), (1, 0, 1), (1, 1, 1), (1, 1, 1), (0, 1, 1), (0, 1, 1), (0, 0, 1),  # back face
+        (0, 0, 0), (0, 0, 1), (1, 0, 0), (1, 0, 1), (0, 1, 0), (0, 1, 1), (1, 1, 0), (1, 1, 1),  # connecting edges
+    ], dtype=np.float32)
+    bounding_box_vbo: Optional[int] = None  # Vertex buffer of the unit cube edges, shared by all objects
+
+    # Buffers and textures of released objects, deleted on the GL thread by delete_released_gl_objects()
+    released_gl_objects_lock = threading.Lock()
+    released_buffer_ids: List[int] = []
+    released_texture_ids: List[int] = []
+    # Objects whose vertices were replaced, i.e. that moved or resized, until the scene refreshes their picking rows
+    moved_objects_lock = threading.Lock()
+    moved_objects: Set["SceneObject"] = set()
+
     def __init__(self, position: Tuple[float, float, float], size: Tuple[float, float, float],
                  color: Optional[Tuple[float, float, float]] = None, text: str = "Test"):
         """
@@ -25,10 +47,16 @@ class SceneObject:
         self.position = np.array(position).astype(np.float64)
         self.size = np.array(size).astype(np.float64)
         self.color = color if color is not None else (1.0, 1.0, 1.0)
+        self.vbo: Optional[int] = None  # Vertex buffer of the object, created on first render
+        self.vbo_vertices: Optional[np.ndarray] = None  # The vertex array last uploaded to the vertex buffer
+        self.bounding_box: Optional[Tuple[np.ndarray, np.ndarray]] = None  # Cached (max_corner, min_corner)
+        self.bounding_box_vertices: Optional[np.ndarray] = None  # The vertex array the bounding box was computed of
         self.vertices = self.create_vertices()
         self.selected = False
         self.text = text
         self.font_texture: Optional[Tuple[int, int, int]] = None  # Stores (texture_id, text_width, text_height)
+        self.text_vbo: Optional[int] = None  # Vertex buffer of the text quad, created with the font texture
+        self.text_vbo_vertices: Optional[np.ndarray] = None  # The vertex array the text quad was placed for
 
     def create_text_texture(self, text: str, font_size: int = 80) -> Optional[Tuple[int, int, int]]:
         """
@@ -44,6 +72,9 @@ class SceneObject:
         if self.font_texture is not None:
             return self.font_texture
 
+        # Only the GUI process draws labels, so Pillow's font support is loaded on first use
+        from PIL import Image, ImageDraw, ImageFont
+
         try:
             font = ImageFont.truetype("assets/liberation-sans/LiberationSans-Bold.ttf", font_size)
             # Use getbbox() to calculate the size of the text
@@ -56,9 +87,8 @@ class SceneObject:
             draw = ImageDraw.Draw(image)
             draw.text((0, 0), text, font=font, fill=(64, 64, 80, 255))
 
-            # Convert the image to bytes and create a texture
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            img_data = image.convert("RGBA").tobytes()
+            # Convert the image to bytes and create a texture; the text quad maps it top row first
+            img_data = image.tobytes()
 
             texture_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, texture_id)
@@ -81,25 +111,24 @@ class SceneObject:
         Create the vertices based on the position and size of the object.
 
         Returns:
-            np.ndarray: An array of vertices representing the corners of the object.
+            np.ndarray: A float32 array of vertices representing the corners of the object, ready to be
+                uploaded to a vertex buffer.
         """
-        half_size = self.size / 2.0
-        return np.array([
-            [-half_size[0], -half_size[1], 0.0],
-            [half_size[0], -half_size[1], 0.0],
-            [half_size[0], half_size[1], 0.0],
-            [-half_size[0], half_size[1], 0.0]
-        ]) + self.position
+        vertices = self.UNIT_VERTICES.copy()
+        vertices[:, :2] *= self.size[:2]
+        vertices += self.position
+        return vertices
 
     def update_position(self, dxyz: Vec3) -> None:
         """
-        Update the position of the object by a given displacement.
+        Update the position of the object by a given displacement. The position array is updated in place.
 
         Args:
             dxyz (Vec3): The displacement to apply to the object's position.
         """
         self.position += dxyz
         self.vertices = self.create_vertices()
+        self.mark_moved()
 
     def set_position(self, position: Vec3) -> None:
         """
@@ -110,6 +139,15 @@ class SceneObject:
         """
         self.position = position
         self.vertices = self.create_vertices()
+        self.mark_moved()
+
+    def mark_moved(self) -> None:
+        """
+        Note that the vertices of the object were replaced, so the scene refreshes its row in the picking arrays.
+        May be called from any thread.
+        """
+        with SceneObject.moved_objects_lock:
+            SceneObject.moved_objects.add(self)
 
     def get_position(self) -> Vec3:
         """
@@ -142,7 +180,9 @@ class SceneObject:
             return
 
         texture_id, _text_width, _text_height = self.font_texture
-        text_width, text_height = _text_width / 8, _text_height / 8
+        # The label is placed below the object, so it moves whenever the vertex array is replaced
+        if self.text_vbo_vertices is not self.vertices:
+            self.upload_text_vertices(_text_width / 8, _text_height / 8)
 
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)  # Enable blending
@@ -150,37 +190,105 @@ class SceneObject:
         glBindTexture(GL_TEXTURE_2D, texture_id)
         glColor3f(1.0, 1.0, 1.0)
 
-        glPushMatrix()
-        glTranslatef(self.position[0], self.position[1] - self.size[1] * (1 / 2 + 0.05), self.position[2])
-        glBegin(GL_QUADS)
-        glTexCoord2f(0.0, 0.0)
-        glVertex3f(-text_width / 200.0, -text_height / 200.0, 0.0)
-
-        glTexCoord2f(1.0, 0.0)
-        glVertex3f(text_width / 200.0, -text_height / 200.0, 0.0)
-
-        glTexCoord2f(1.0, 1.0)
-        glVertex3f(text_width / 200.0, text_height / 200.0, 0.0)
-
-        glTexCoord2f(0.0, 1.0)
-        glVertex3f(-text_width / 200.0, text_height / 200.0, 0.0)
-        glEnd()
-        glPopMatrix()
+        glBindBuffer(GL_ARRAY_BUFFER, self.text_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 20, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, 20, ctypes.c_void_p(12))
+        glDrawArrays(GL_QUADS, 0, 4)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
         glBindTexture(GL_TEXTURE_2D, 0)
         glDisable(GL_TEXTURE_2D)
         glDisable(GL_BLEND)  # Disable blending after rendering
 
+    def upload_text_vertices(self, text_width: float, text_height: float) -> None:
+        """
+        Fill the vertex buffer of the text quad with interleaved x, y, z, u, v values, creating the buffer
+        if needed. The quad is centered just below the object in world space, so drawing it needs no
+        matrix changes.
+
+        Args:
+            text_width (float): The width of the text texture, scaled down.
+            text_height (float): The height of the text texture, scaled down.
+        """
+        w, h = text_width / 200.0, text_height / 200.0
+        vertices = np.array([
+            (-w, -h, 0.0, 0.0, 1.0),
+            (w, -h, 0.0, 1.0, 1.0),
+            (w, h, 0.0, 1.0, 0.0),
+            (-w, h, 0.0, 0.0, 0.0),
+        ], dtype=np.float32)
+        vertices[:, :3] += (self.position[0], self.position[1] - self.size[1] * (1 / 2 + 0.05), self.position[2])
+        if self.text_vbo is None:
+            self.text_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.text_vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.text_vbo_vertices = self.vertices
+
+    def upload_vertices(self) -> None:
+        """Copy the current vertices as float32 into the vertex buffer of the object, creating the buffer if needed."""
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        vertices = np.ascontiguousarray(self.vertices, dtype=np.float32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.vbo_vertices = self.vertices
+
+    def draw_vertices(self, mode: int) -> None:
+        """
+        Draw the x, y, z vertices of the object from its vertex buffer with a single call.
+        Moving or resizing the object replaces the vertex array, which is then uploaded again.
+
+        Args:
+            mode (int): The OpenGL primitive type, e.g. GL_QUADS.
+        """
+        if self.vbo_vertices is not self.vertices:
+            self.upload_vertices()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(mode, 0, len(self.vertices))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def release_gl_objects(self) -> None:
+        """
+        Release the vertex buffers and the text texture of an object that is dropped for good. May be called
+        from any thread; they are deleted by the next delete_released_gl_objects() call.
+        """
+        with self.released_gl_objects_lock:
+            for buffer_id in (self.vbo, self.text_vbo):
+                if buffer_id is not None:
+                    SceneObject.released_buffer_ids.append(buffer_id)
+            if self.font_texture is not None:
+                SceneObject.released_texture_ids.append(self.font_texture[0])
+            self.vbo = self.vbo_vertices = None
+            self.text_vbo = self.text_vbo_vertices = None
+            self.font_texture = None
+
+    @classmethod
+    def delete_released_gl_objects(cls) -> None:
+        """Delete the buffers and textures of released objects. Must be called on the GL thread."""
+        with cls.released_gl_objects_lock:
+            buffer_ids, SceneObject.released_buffer_ids = SceneObject.released_buffer_ids, []
+            texture_ids, SceneObject.released_texture_ids = SceneObject.released_texture_ids, []
+        if buffer_ids:
+            glDeleteBuffers(len(buffer_ids), buffer_ids)
+        if texture_ids:
+            glDeleteTextures(texture_ids)
+
     def render_object(self) -> None:
         """
         Render the object. This method should be overridden by subclasses to define specific drawing logic.
         """
-        glBegin(GL_QUADS)
         if self.color:
             glColor3f(*self.color)
-        for vertex in self.vertices:
-            glVertex3f(*vertex)
-        glEnd()
+        self.draw_vertices(GL_QUADS)
 
 
     def render_bounding_box(self) -> None:
@@ -190,44 +298,32 @@ class SceneObject:
         # Calculate the bounding box corners based on the object's vertices
         max_corner, min_corner = self.get_bounding_box()
 
+        if SceneObject.bounding_box_vbo is None:
+            SceneObject.bounding_box_vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, SceneObject.bounding_box_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.UNIT_CUBE_EDGES.nbytes, self.UNIT_CUBE_EDGES, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
         glColor3f(1.0, 1.0, 1.0)  # White color for the bounding box
         glLineWidth(4.0)  # Thicker lines for visibility
 
-        glBegin(GL_LINE_LOOP)
-        # Front face
-        glVertex3f(min_corner[0], min_corner[1], min_corner[2])
-        glVertex3f(max_corner[0], min_corner[1], min_corner[2])
-        glVertex3f(max_corner[0], max_corner[1], min_corner[2])
-        glVertex3f(min_corner[0], max_corner[1], min_corner[2])
-        glEnd()
-
-        glBegin(GL_LINE_LOOP)
-        # Back face
-        glVertex3f(min_corner[0], min_corner[1], max_corner[2])
-        glVertex3f(max_corner[0], min_corner[1], max_corner[2])
-        glVertex3f(max_corner[0], max_corner[1], max_corner[2])
-        glVertex3f(min_corner[0], max_corner[1], max_corner[2])
-        glEnd()
-
-        glBegin(GL_LINES)
-        # Connect the front and back faces
-        for i in range(4):
-            glVertex3f(min_corner[0] if i % 2 == 0 else max_corner[0],
-                       min_corner[1] if i < 2 else max_corner[1],
-                       min_corner[2])
-            glVertex3f(min_corner[0] if i % 2 == 0 else max_corner[0],
-                       min_corner[1] if i < 2 else max_corner[1],
-                       max_corner[2])
-        glEnd()
+        # Stretch the unit cube over the bounding box and draw its 12 edges with a single call
+        glPushMatrix()
+        glTranslatef(*min_corner)
+        glScalef(*(max_corner - min_corner))
+        glBindBuffer(GL_ARRAY_BUFFER, SceneObject.bounding_box_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(GL_LINES, 0, len(self.UNIT_CUBE_EDGES))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glPopMatrix()
 
     def get_bounding_box(self):
-        min_corner = [0, 0, 0]
-        max_corner = [0, 0, 0]
-        if isinstance(self.vertices, np.ndarray):
-            min_corner = np.min(self.vertices, axis=0)
-            max_corner = np.max(self.vertices, axis=0)
-        else:
-            verts = [v[0] for v in self.vertices]
-            min_corner = np.min(verts, axis=0)
-            max_corner = np.max(verts, axis=0)
-        return max_corner, min_corner
+        # Moving or resizing the object replaces the vertex array, so the cached corners stay valid until then
+        if self.bounding_box_vertices is not self.vertices:
+            # vertices are always an array; its first three columns hold x, y, z
+            verts = self.vertices[:, :3]
+            self.bounding_box = (np.max(verts, axis=0), np.min(verts, axis=0))
+            self.bounding_box_vertices = self.vertices
+        return self.bounding_box
@@ -0,0 +1,103 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from PIL import Image
+
+# Thumbnail creation and texture decoding for ImageObject. These functions run in the worker processes of
+# ImageObject.executor, so this module only imports Pillow; importing OpenGL or the scene objects would
+# slow down the start of every worker.
+
+# Thumbnail folders this worker process already created, so the images of a folder only create it once.
+# Workers run one job at a time, so no lock is needed.
+known_thumbnail_folders: Set[str] = set()
+
+
+def create_thumbnail(image_path: Path, thumbnail_path: Path) -> None:
+    """
+    Create a thumbnail for an image and save it.
+
+    Args:
+        image_path (Path): The path to the image.
+        thumbnail_path (Path): The path to save the thumbnail to.
+
+    Raises:
+        FileNotFoundError: If the image does not exist.
+    """
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image file {image_path} not found.")
+
+    with Image.open(image_path) as img:
+        if img.format == "JPEG":
+            # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 in the DCT domain, as far as 512px allow
+            img.draft("RGB", (512, 512))
+        # Shrinking first lets JPEGs decode at reduced scale and converts only the small image.
+        # Bilinear filtering is enough for 512px thumbnails and uses the fastest (SIMD) resampling path.
+        img.thumbnail((512, 512), resample=Image.BILINEAR)
+        img = img.convert("RGB")
+        img.save(thumbnail_path, "JPEG")
+        print(f"Thumbnail saved to {thumbnail_path}")
+
+
+def decode_texture_data(path: Path, max_texture_size: int) -> Tuple[List[bytes], int, int]:
+    """
+    Decode an image into RGB pixel data, top row first. Photos and thumbnails have no alpha channel,
+    so RGB saves a quarter of the memory and upload bandwidth of RGBA. The whole mipmap chain is
+    box-filtered here, off the GL thread, so the GL thread only uploads it.
+
+    Args:
+        path (Path): The path to the image or its thumbnail.
+        max_texture_size (int): Larger images are downscaled to fit this size.
+
+    Returns:
+        Tuple[List[bytes], int, int]: The pixel data of each mipmap level, width and height of the texture.
+    """
+    with Image.open(path) as image:
+        if image.format == "JPEG":
+            image.draft("RGB", (max_texture_size, max_texture_size))
+        image.thumbnail((max_texture_size, max_texture_size))
+        if image.mode != "RGB":  # convert() copies even if the mode already matches
+            image = image.convert("RGB")
+        width, height = image.size
+        levels = [image.tobytes()]
+        while image.width > 1 or image.height > 1:
+            image = image.resize((max(1, image.width // 2), max(1, image.height // 2)), Image.BOX)
+            levels.append(image.tobytes())
+        return levels, width, height
+
+
+def prepare_thumbnail(image_path: Path, thumbnail_path: Path, texture_path: Optional[Path],
+                      max_texture_size: int) -> Optional[Tuple[List[bytes], int, int]]:
+    """
+    Create the thumbnail of an image if it does not exist yet or is older than the image, and decode the texture,
+    so only the upload is left for the GL thread. Runs in a worker process of ImageObject.executor, so it takes
+    paths instead of the ImageObject.
+
+    Args:
+        image_path (Path): The path to the image.
+        thumbnail_path (Path): The path of the thumbnail.
+        texture_path (Optional[Path]): The image or thumbnail to decode, or None to skip decoding.
+        max_texture_size (int): Larger images are downscaled to fit this size.
+
+    Returns:
+        Optional[Tuple[List[bytes], int, int]]: The decoded texture data, or None if it was not decoded.
+    """
+    thumbnail_folder = os.path.dirname(thumbnail_path)
+    if thumbnail_folder not in known_thumbnail_folders:
+        os.makedirs(thumbnail_folder, exist_ok=True)
+        known_thumbnail_folders.add(thumbnail_folder)
+    # An image edited after its thumbnail was written gets a new thumbnail. The image is stat'ed here, as the
+    # images restored from a saved state carry no mtime from a directory scan.
+    try:
+        is_stale = os.stat(thumbnail_path).st_mtime < os.stat(image_path).st_mtime
+    except FileNotFoundError:
+        is_stale = True
+    if is_stale:
+        create_thumbnail(image_path, thumbnail_path)
+    if texture_path is None:
+        return None
+    try:
+        return decode_texture_data(texture_path, max_texture_size)
+    except Exception as e:
+        print(f"Failed to decode texture: {e}")
+        return None
@@ -11,6 +11,9 @@ class Triangle(SceneObject):
     Represents a triangular object in the scene, derived from SceneObject.
     """
 
+    # Corners of a triangle of unit width and height, centered at the origin
+    UNIT_VERTICES = np.array(((-0.5, -0.5, 0.0), (0.5, -0.5, 0.0), (0.0, 0.5, 0.0)), dtype=np.float32)
+
     def __init__(self, position: Vec3, size: Vec3 = np.array((1.0, 1.0, 0.0)),
                  color: Tuple[float, float, float] = (0.0, 0.0, 1.0), text: str = ""):
         """
@@ -22,29 +25,23 @@ class Triangle(SceneObject):
             color (Tuple[float, float, float]): The color of the triangle in RGB format. Defaults to blue.
             text (str): Optional text to display on the triangle. Defaults to an empty string.
         """
-        super().__init__(position, size, color, text)
-        self.vertices = self.create_vertices()
+        super().__init__(position, size, color, text)  # also creates the vertices
 
     def create_vertices(self) -> Vec3:
         """
         Create the vertices for the triangle based on its position and size.
 
         Returns:
-            Vec3: An array of vertices representing the triangle's corners.
+            Vec3: A float32 array of vertices representing the triangle's corners.
         """
-        half_size = self.size / 2.0
-        return np.array([
-            self.position + [-half_size[0], -half_size[1], 0.0],
-            self.position + [half_size[0], -half_size[1], 0.0],
-            self.position + [0.0, half_size[1], 0.0]
-        ])
+        vertices = self.UNIT_VERTICES.copy()
+        vertices[:, :2] *= self.size[:2]
+        vertices += self.position
+        return vertices
 
     def render_object(self) -> None:
         """
         Render the triangle using OpenGL.
         """
-        glBegin(GL_TRIANGLES)
         glColor3f(*self.color)
-        for vertex in self.vertices:
-            glVertex3f(*vertex)
-        glEnd()
+        self.draw_vertices(GL_TRIANGLES)
@@ -1,3 +1,5 @@
+import math
+import os
 import time
 from pathlib import Path
 from typing import Optional, Union, Tuple, List
@@ -7,7 +9,7 @@ import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from PyQt5.QtCore import QPoint, QEvent
-from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QMouseEvent, QKeyEvent
 from PyQt5.QtGui import QPixmap
@@ -22,6 +24,9 @@ from models.large_image_object import LargeImageObject
 from models.scene_object import SceneObject
 from views.utils import select_folder_dialog
 
+# Report OpenGL errors through a debug message callback; set PICPYLES_GL_DEBUG=1 to enable
+GL_DEBUG = os.environ.get("PICPYLES_GL_DEBUG") == "1"
+
 
 class MainWindow(QMainWindow):
     """
@@ -175,6 +180,7 @@ class OpenGLWidget(QOpenGLWidget):
 
         self.scene: SceneObject = scene
         self.done = False
+        self.gl_debug_callback: Optional[GLDEBUGPROC] = None
 
         # Mouse state tracking
         self.last_mouse_pos: Optional[Tuple[int, int]] = None
@@ -200,11 +206,14 @@ class OpenGLWidget(QOpenGLWidget):
         self.focal_length: float = 1000.0  # Focal length in mm
         self.sensor_size: Tuple[int, int] = (800, 600)  # Sensor size in pixels
         self.aspect_ratio: float = self.sensor_size[0] / self.sensor_size[1]
+        self.fovy: float = self.compute_fovy()  # Vertical field of view in degrees
+
+        # Textures are uploaded on the GUI thread while painting; limit the uploads per frame
+        # so opening a large folder does not block event processing for one long frame
+        self.texture_uploads_per_frame: int = 8
 
-        # Set up a timer to trigger regular redraws
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(16)  # Approximately 60 frames per second
+        # Redraw on demand: whenever the scene changes and after user input, instead of on a fixed timer
+        self.scene.signal_scene_changed.connect(self.update)
 
     def compute_optimal_image_sequence(self) -> None:
         """
@@ -227,6 +236,7 @@ class OpenGLWidget(QOpenGLWidget):
         Toggle the visibility of the connector line object in the scene.
         """
         self.scene.toggle_connector_line_visibility()
+        self.update()
 
 
     def get_opengl_format(self) -> QSurfaceFormat:
@@ -312,6 +322,7 @@ class OpenGLWidget(QOpenGLWidget):
         """
         self.last_mouse_pos = event.pos()
         self.current_button = event.button()
+        self.update()  # selection changes below are drawn with the next frame
 
         # Query the scene for the object at the clicked position
         self.clicked_object = self.get_clicked_object(self.last_mouse_pos)
@@ -361,6 +372,7 @@ class OpenGLWidget(QOpenGLWidget):
         Args:
             event: The key press event.
         """
+        self.update()
         if not self.large_image:
             # no image open, this feature makes no sense
             return
@@ -447,15 +459,13 @@ class OpenGLWidget(QOpenGLWidget):
             dy = event.pos().y() - self.last_mouse_pos.y()
 
             if self.current_button == Qt.LeftButton and self.selected_objects:
-                # Move selected objects
-                for obj in self.selected_objects:
-                    if isinstance(obj, SceneObject):
-                        new_position = np.array([
-                            dx * -self.translation_z / self.focal_length,
-                            dy * self.translation_z / self.focal_length,
-                            0.0
-                        ])
-                        obj.update_position(new_position)
+                # Move selected objects, all by the same displacement
+                displacement = np.array([
+                    dx * -self.translation_z / self.focal_length,
+                    dy * self.translation_z / self.focal_length,
+                    0.0
+                ])
+                self.scene.move_objects(self.selected_objects, displacement)
             elif self.current_button == Qt.LeftButton and self.clicked_object is None:
                 # Update the multi-select box
                 self.selection_end = event.pos()
@@ -477,6 +487,7 @@ class OpenGLWidget(QOpenGLWidget):
         self.last_mouse_pos = None
         self.current_button = None
         self.clicked_object = None
+        self.update()
 
         if self.selection_start and self.selection_end:
             # Finalize the selection of objects within the selection rectangle
@@ -504,26 +515,65 @@ class OpenGLWidget(QOpenGLWidget):
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         glClearColor(0.9, 0.9, 1.0, 1.0)
         glEnable(GL_DEPTH_TEST)
+        if GL_DEBUG:
+            self.install_gl_debug_callback()
+
+    def install_gl_debug_callback(self) -> None:
+        """
+        Install a debug message callback that prints OpenGL errors as the driver reports them,
+        so the render loop does not have to poll glGetError. Requires OpenGL 4.3 or KHR_debug.
+        """
+        def print_gl_debug_message(source, msg_type, msg_id, severity, length, message, user_param):
+            print(f"OpenGL debug message {msg_id}: {message.decode(errors='replace')}")
+
+        try:
+            # Keep a reference to the callback, the driver only stores the function pointer
+            self.gl_debug_callback = GLDEBUGPROC(print_gl_debug_message)
+            glEnable(GL_DEBUG_OUTPUT)
+            glDebugMessageCallback(self.gl_debug_callback, None)
+        except Exception as e:
+            print(f"Failed to install OpenGL debug callback: {e}")
+
+    def compute_fovy(self) -> float:
+        """
+        Compute the vertical field of view from the sensor size and focal length.
+
+        Returns:
+            float: The vertical field of view in degrees.
+        """
+        return math.degrees(2 * math.atan(self.sensor_size[1] / (2 * self.focal_length)))
+
+    def update_projection(self) -> None:
+        """
+        Load the perspective projection. It only depends on the widget size, so it is set on resize
+        instead of on every frame.
+        """
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(self.fovy, self.aspect_ratio, abs(self.tz_min) * 0.9, abs(self.tz_max) * 1.1)
+        glMatrixMode(GL_MODELVIEW)
 
     def update_camera(self) -> None:
         """
-        Update the camera settings, adjusting the perspective and translating the view
-        based on the current camera position.
+        Update the camera settings, translating the view based on the current camera position.
         """
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glLoadIdentity()
-        fovy = 2 * np.degrees(np.arctan(self.sensor_size[1] / (2 * self.focal_length)))
-        gluPerspective(fovy, self.aspect_ratio, abs(self.tz_min) * 0.9, abs(self.tz_max) * 1.1)
         glTranslatef(self.translation_x, self.translation_y, self.translation_z)
 
     def setup_geometry(self) -> None:
         """
         Render all the objects in the scene that have loaded thumbnails.
+        At most texture_uploads_per_frame objects get their texture uploaded per frame; the remaining
+        ones are skipped and another frame is scheduled for them.
         """
-        with self.scene.lock:
-            for obj in self.scene.objects:
-                if obj.has_thumbnail:
-                    obj.render()
+        # Thumbnails on screen are prepared before the rest of the folder
+        center = np.array((-self.translation_x, -self.translation_y))
+        half_extent = np.array(self.sensor_size) * (0.5 * -self.translation_z / self.focal_length)
+        self.scene.prioritize_thumbnails_in_rectangle(center - half_extent, center + half_extent)
+
+        if self.scene.render_objects(self.texture_uploads_per_frame):
+            self.update()
 
     def paintGL(self) -> None:
         """
@@ -579,6 +629,8 @@ class OpenGLWidget(QOpenGLWidget):
         glViewport(0, 0, w, h)
         self.aspect_ratio = w / h
         self.sensor_size = (w, h)
+        self.fovy = self.compute_fovy()
+        self.update_projection()
 
     def showEvent(self, event: PyQt5.QtGui.QShowEvent) -> None:
         """